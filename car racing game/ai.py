@@ -0,0 +1,134 @@
+import numpy as np
+from core import ComputerCar, PATH, load_assets
+from utils import get_rotated
+
+
+class AIFleet:
+    """Any number of computer cars following a path, stepped together.
+
+    Positions, angles, velocities and waypoint indices live in NumPy arrays
+    and every step is a handful of array operations, applying the same
+    steering and waypoint rules as ComputerCar to all cars at once.
+
+    speed_offsets are added to max_vel per car, and skill scales each car's
+    rotation_vel, so a field can mix fast and slow, sharp and sloppy drivers.
+    Like ComputerCar, each car accelerates back up to its cruise speed after
+    a standstill or a corner. Given a racing_line, cars follow it the way
+    ComputerCar does instead, slowing for the corners ahead.
+    img is either one sprite for every car or a list with one per car, e.g.
+    liveries from a SkinCache, which all share a shape.
+    """
+
+    def __init__(self, count, max_vel=3, rotation_vel=3, path=PATH, start_positions=None,
+                 speed_offsets=0.0, skill=1.0, img=None, racing_line=None):
+        self.count = count
+        self.path = np.asarray(path, dtype=np.float64)
+        self.racing_line = racing_line
+        if img is None:
+            img = load_assets().cars[ComputerCar.IMG_NAME]
+        self.imgs = list(img) if isinstance(img, (list, tuple)) else [img] * count
+        self.img = self.imgs[0]
+        self.width, self.height = self.img.get_size()
+
+        if start_positions is None:
+            start_positions = [ComputerCar.START_POS] * count
+        self.start = np.array(start_positions, dtype=np.float64)
+        self.base_vel = np.broadcast_to(np.asarray(max_vel + np.asarray(speed_offsets), dtype=np.float64),
+                                        (count,)).copy()
+        self.rotation_vel = np.broadcast_to(rotation_vel * np.asarray(skill, dtype=np.float64),
+                                            (count,)).copy()
+        self.acceleration = 0.1
+
+        self.x = np.empty(count)
+        self.y = np.empty(count)
+        self.angle = np.empty(count)
+        self.vel = np.empty(count)
+        # Speed for the current level, which each car returns to after slowing
+        self.cruise_vel = np.empty(count)
+        self.current_point = np.empty(count, dtype=np.int64)
+        self.line_index = np.empty(count, dtype=np.int64)
+        if racing_line is not None:
+            self.lookahead = int(ComputerCar.LOOKAHEAD // racing_line.step)
+            self.curvature_ahead = racing_line.curvature_ahead(ComputerCar.LOOKAHEAD)
+        self.reset()
+        self.vel[:] = self.cruise_vel
+
+    def reset(self):
+        self.x[:], self.y[:] = self.start.T
+        self.angle[:] = 0
+        self.vel[:] = 0
+        self.cruise_vel[:] = self.base_vel
+        self.current_point[:] = 0
+        if self.racing_line is not None:
+            self.line_index[:] = [self.racing_line.nearest(x + self.width / 2, y + self.height / 2)
+                                  for x, y in self.start]
+
+    def next_level(self, level):
+        self.reset()
+        self.cruise_vel[:] = self.vel[:] = self.base_vel + (level - 1) * 0.2
+
+    def finished(self):
+        """Cars that have passed every waypoint. Racing line cars never finish"""
+        if self.racing_line is not None:
+            return np.zeros(self.count, dtype=bool)
+        return self.current_point >= len(self.path)
+
+    def move(self):
+        if self.racing_line is not None:
+            self.follow_racing_line()
+            return
+
+        active = ~self.finished()
+        if not active.any():
+            return
+
+        target = self.path[np.minimum(self.current_point, len(self.path) - 1)]
+        self.steer_towards(target, active)
+
+        # Waypoint capture: the target lies inside the car's (unrotated) sprite rect
+        left, top = np.trunc(self.x), np.trunc(self.y)
+        reached = ((target[:, 0] >= left) & (target[:, 0] < left + self.width) &
+                   (target[:, 1] >= top) & (target[:, 1] < top + self.height))
+        self.current_point += reached & active
+
+        self.vel = np.where(active, np.minimum(self.vel + self.acceleration, self.cruise_vel), self.vel)
+        self.drive(self.vel * active)
+
+    def follow_racing_line(self):
+        # Steer the middle of each car along the line, as ComputerCar does
+        half_size = np.array([self.width / 2, self.height / 2])
+        line = self.racing_line
+        self.line_index = line.advance(self.line_index, self.x + half_size[0], self.y + half_size[1])
+        self.steer_towards(line.points[(self.line_index + self.lookahead) % line.count] - half_size)
+
+        # Ease off for the corner ahead: each car's RacingLine.corner_speeds, for its own turning ability
+        with np.errstate(divide="ignore"):
+            corner_vel = np.radians(self.rotation_vel) / self.curvature_ahead[self.line_index]
+        self.vel = np.minimum(np.minimum(self.vel + self.acceleration, self.cruise_vel), corner_vel)
+        self.drive(self.vel)
+
+    def steer_towards(self, target, active=True):
+        x_diff = target[:, 0] - self.x
+        y_diff = target[:, 1] - self.y
+
+        # Heading that points at the target, in the same range ComputerCar.calculate_angle uses
+        desired = (np.degrees(np.arctan2(-x_diff, -y_diff)) + 90) % 360 - 90
+        desired[y_diff == 0] = 90
+
+        difference_in_angle = self.angle - desired
+        difference_in_angle[difference_in_angle > 180] -= 360
+        turn = np.minimum(self.rotation_vel, np.abs(difference_in_angle))
+        self.angle -= np.where(difference_in_angle > 0, turn, -turn) * active
+
+    def drive(self, step):
+        radians = np.radians(self.angle)
+        self.y -= np.cos(radians) * step
+        self.x -= np.sin(radians) * step
+
+    def draw(self, win):
+        """Draw every car with one Surface.blits call"""
+        blits = []
+        for img, x, y, angle in zip(self.imgs, self.x.tolist(), self.y.tolist(), self.angle.tolist()):
+            rotated_image, (dx, dy) = get_rotated(img, angle)
+            blits.append((rotated_image, (x + dx, y + dy)))
+        return win.blits(blits)
@@ -0,0 +1,102 @@
+"""Build-once cache of scaled images and collision masks.
+
+Each entry is a small header followed by raw pixel data (RGB/RGBA) or a
+packed mask bitmap, named after a hash of the source file and scale factor.
+Later launches memory-map the entry and wrap it in a Surface directly,
+skipping PNG/JPEG decoding, resampling and mask building.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import numpy as np
+import pygame
+from utils import scale_image
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset_cache")
+VERSION = 1
+
+# magic, version, width, height, bytes per pixel (0 for a mask bitmap)
+HEADER = struct.Struct("<4sHIIH")
+MAGIC = b"RCAC"
+FORMATS = {3: "RGB", 4: "RGBA"}
+
+
+def cache_key(path, factor, kind):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{factor!r}:{kind}:{VERSION}".encode())
+    return digest.hexdigest()
+
+
+def _entry_path(path, factor, kind):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{cache_key(path, factor, kind)[:16]}.{kind}")
+
+
+def _map(entry):
+    """Memory-map a cache entry, returning (header fields, data view) or None"""
+    try:
+        with open(entry, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, width, height, depth = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return (width, height, depth), memoryview(data)[HEADER.size:]
+
+
+def _store(entry, width, height, depth, payload):
+    """Write an entry atomically; a failed write just leaves the cache cold"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, width, height, depth))
+            f.write(payload)
+        os.replace(tmp, entry)
+    except OSError:
+        pass
+
+
+def load_image(path, factor=1):
+    """Load an image scaled by factor, from the cache when possible"""
+    entry = _entry_path(path, factor, "img")
+    mapped = _map(entry)
+    if mapped is not None:
+        (width, height, depth), pixels = mapped
+        # The surface keeps the mapping alive and reads pixels straight from it
+        return pygame.image.frombuffer(pixels, (width, height), FORMATS[depth])
+
+    img = pygame.image.load(path)
+    if factor != 1:
+        img = scale_image(img, factor)
+    depth = 4 if img.get_flags() & pygame.SRCALPHA else 3
+    _store(entry, img.get_width(), img.get_height(), depth,
+           pygame.image.tobytes(img, FORMATS[depth]))
+    return img
+
+
+def load_mask(path, factor=1, img=None):
+    """Collision mask of an image scaled by factor, from the cache when possible.
+    img is the already loaded image, used only when the cache is cold"""
+    entry = _entry_path(path, factor, "mask")
+    mapped = _map(entry)
+    if mapped is not None:
+        (width, height, _), bits = mapped
+        # Unpack to one byte per pixel and let pygame build the mask from a colorkeyed 8-bit surface
+        plane = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=width * height)
+        surface = pygame.image.frombuffer(plane.tobytes(), (width, height), "P")
+        surface.set_colorkey(0)
+        return pygame.mask.from_surface(surface)
+
+    if img is None:
+        img = load_image(path, factor)
+    mask = pygame.mask.from_surface(img)
+    plane = pygame.surfarray.array3d(mask.to_surface())[:, :, 0].T != 0
+    _store(entry, mask.get_size()[0], mask.get_size()[1], 0, np.packbits(plane).tobytes())
+    return mask
@@ -0,0 +1,322 @@
+"""Repeatable performance numbers from scripted, seeded scenarios.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json
+
+Every scenario steps the real simulation and renders each step with the
+game's own draw() (main.py) to an offscreen window under the SDL dummy
+driver. Every timing is the best of a few repeats, as single runs on a busy
+machine vary by well over 10%. Results are written as JSON; given a baseline
+(an earlier output), any metric worse than it by more than the tolerance is
+reported and the exit status is 1.
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+import random
+import numpy as np
+import pygame
+import main as game
+from ai import AIFleet
+from core import Race, PlayerCar, ComputerCar, Controls, IDLE, PATH
+from particles import ParticleSystem, EXHAUST
+from sensors import RaySensor
+from track import get_racing_line
+from utils import create_gradient_surface, blit_rotate_center
+
+SEED = 1234
+FORMAT_VERSION = 1
+# Fresh runs of each scenario, of which the fastest counts
+REPEATS = 3
+
+# Which way is better for every metric that is compared against a baseline
+HIGHER_IS_BETTER = {"steps_per_s": True, "frames_per_s": True, "us_per_call": False, "peak_kib": False}
+# Changes smaller than this never count as regressions: sub-microsecond calls
+# move by more than any sensible tolerance between runs of the same code
+NOISE_FLOOR = {"us_per_call": 1.0}
+# Allowed slowdown as a fraction of the baseline. Separate runs of the same
+# code on one machine differ by up to ~40%, so only clear regressions fail
+DEFAULT_TOLERANCE = 0.5
+
+
+class Scene:
+    """The game's window and surfaces, which importing main.py set up"""
+
+    def __init__(self):
+        self.win = game.WIN
+        self.assets = game.ASSETS
+        self.background = game.TRACK_BACKGROUND
+        # For races without particles of their own
+        self.particle_system = ParticleSystem(rng=np.random.default_rng(SEED))
+        self.animated_bg = game.AnimatedBackground(random.Random(SEED))
+
+    def new_race(self, particle_system=None):
+        race = Race(PlayerCar(4.5, 4.5, self.assets.cars["Red"]),
+                    ComputerCar(3, 3, PATH, self.assets.cars["Green"], get_racing_line(PATH)),
+                    particle_system=particle_system)
+        race.game_info.start_level()
+        return race
+
+    def draw_race(self, race):
+        """The game's frame, drawn by main.draw"""
+        game.draw(self.win, [(self.background, (0, 0))], race.player_car, race.computer_car, race.game_info,
+                  race.particle_system or self.particle_system, self.animated_bg, race.progress)
+
+
+def step_race(race, controls):
+    # Levels restart at once, as in run_headless
+    if not race.game_info.started:
+        race.game_info.start_level()
+    return race.step(controls)
+
+
+def lap_driver(line, lookahead=ComputerCar.LOOKAHEAD):
+    """Controls that hold full throttle and steer the player's centre along line"""
+    index = None
+
+    def controls(race):
+        nonlocal index
+        car = race.player_car
+        x, y = car.rect_center()
+        index = line.nearest(x, y) if index is None else line.advance_one(index, x, y)
+        target_x, target_y = line.target_ahead(index, lookahead)
+        # Heading that points at the target; the car drives along (-sin, -cos)
+        desired = math.degrees(math.atan2(x - target_x, y - target_y))
+        difference = (desired - car.angle + 180) % 360 - 180
+        return Controls(left=difference > car.rotation_vel / 2, right=difference < -car.rotation_vel / 2,
+                        forward=True)
+    return controls
+
+
+def idle_grid(scene):
+    """Both cars on the grid, the player never moving"""
+    race = scene.new_race()
+    return (lambda: step_race(race, IDLE)), (lambda: scene.draw_race(race))
+
+
+def full_throttle_lap(scene):
+    """The player flat out around the racing line, against the computer car"""
+    race = scene.new_race()
+    driver = lap_driver(get_racing_line(PATH))
+    return (lambda: step_race(race, driver(race))), (lambda: scene.draw_race(race))
+
+
+def particle_storm(scene):
+    """The player scraping the walls at full throttle. Every wall contact
+    sets off an extra burst of sparks on top of the game's own, and both
+    cars leave exhaust, keeping thousands of particles alive"""
+    particle_system = ParticleSystem(rng=np.random.default_rng(SEED))
+    race = scene.new_race(particle_system)
+
+    def step():
+        particle_system.update()
+        for car in race.cars:
+            particle_system.add_exhaust_particles(car.x, car.y, car.angle, car.vel)
+        # Full throttle with a long left turn every second, into and along the walls
+        controls = Controls(left=race.steps % 60 < 25, forward=True)
+        if step_race(race, controls):
+            particle_system.add_collision_particles(race.player_car.x, race.player_car.y, 150)
+    return step, (lambda: scene.draw_race(race))
+
+
+def many_ai_cars(scene, count=64):
+    """A field of racing line cars of mixed speed and skill, moved and drawn as a fleet"""
+    starts = [(ComputerCar.START_POS[0] + 30 * (i % 4), ComputerCar.START_POS[1] + 50 * (i // 4))
+              for i in range(count)]
+    fleet = AIFleet(count, start_positions=starts, speed_offsets=np.linspace(-0.5, 1.5, count),
+                    skill=np.linspace(0.8, 1.2, count), img=scene.assets.cars["Green"],
+                    racing_line=get_racing_line(PATH))
+
+    def render():
+        scene.win.blit(scene.background, (0, 0))
+        fleet.draw(scene.win)
+    return fleet.move, render
+
+
+SCENARIOS = {
+    "idle-grid": (idle_grid, 3000),
+    "full-throttle-lap": (full_throttle_lap, 1500),
+    "particle-storm": (particle_storm, 1500),
+    "many-ai-cars": (many_ai_cars, 1000),
+}
+
+
+def run_scenario(scene, build, steps, repeats=REPEATS):
+    """Time steps of simulation and rendering over repeats fresh runs, keeping
+    the fastest, then rerun under tracemalloc for the peak"""
+    simulation = total = float("inf")
+    clock = time.perf_counter
+    for _ in range(repeats):
+        step, render = build(scene)
+        run_simulation = run_rendering = 0.0
+        for _ in range(steps):
+            start = clock()
+            step()
+            middle = clock()
+            render()
+            end = clock()
+            run_simulation += middle - start
+            run_rendering += end - middle
+        simulation = min(simulation, run_simulation)
+        total = min(total, run_simulation + run_rendering)
+
+    # A fresh run, so the peak covers building the scenario too
+    tracemalloc.start()
+    step, render = build(scene)
+    for _ in range(steps):
+        step()
+        render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "steps": steps,
+        "steps_per_s": round(steps / simulation, 1),
+        "frames_per_s": round(steps / total, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def per_call(function, number, repeat=5):
+    """Best average of repeat batches of number calls, in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return {"us_per_call": round(best * 1e6, 3)}
+
+
+def wall_pose(car, mask):
+    """Slide car left from where it stands until it touches mask"""
+    start_x, start_y = car.x, car.y
+    for offset in range(0, 200, 2):
+        car.x = start_x - offset
+        if car.collide(mask):
+            return
+    car.x, car.y = start_x, start_y
+
+
+def call_costs(scene):
+    """Per-call cost of the functions every frame or step leans on"""
+    race = scene.new_race(ParticleSystem(rng=np.random.default_rng(SEED)))
+    particle_system = race.particle_system
+
+    # A steady population: long-lived particles spread over the window
+    rng = np.random.default_rng(SEED)
+    n = 2000
+    particle_system.spawn(rng.uniform(0, 800, (n, 2)), rng.uniform(-1, 1, (n, 2)),
+                          np.full(n, EXHAUST), 30000)
+
+    mask = scene.assets.track_border_mask
+    free_car = PlayerCar(4.5, 4.5, scene.assets.cars["Red"])
+    wall_car = PlayerCar(4.5, 4.5, scene.assets.cars["Red"])
+    wall_car.angle = 30
+    wall_pose(wall_car, mask)
+
+    car_img = scene.assets.cars["Red"]
+
+    # A field of cars spread around the racing line, facing along it
+    line = get_racing_line(PATH)
+    along = np.linspace(0, len(line.points) - 1, 64).astype(int)
+    ray_x, ray_y = line.points[along].T
+    ray_heading = np.degrees(np.arctan2(-line.tangent[along, 0], -line.tangent[along, 1]))
+    sensor = RaySensor(np.linspace(-90, 90, 16))
+    return {
+        "draw": per_call(lambda: scene.draw_race(race), 200),
+        "ParticleSystem.update": per_call(particle_system.update, 200),
+        "ParticleSystem.draw": per_call(lambda: particle_system.draw(scene.win), 200),
+        "AbstractCar.collide (clear)": per_call(lambda: free_car.collide(mask), 5000),
+        "AbstractCar.collide (wall)": per_call(lambda: wall_car.collide(mask), 5000),
+        "create_gradient_surface": per_call(
+            lambda: create_gradient_surface(280, 120, (20, 20, 40), (40, 40, 80)), 20000),
+        "blit_rotate_center": per_call(lambda: blit_rotate_center(scene.win, car_img, (300, 300), 37), 5000),
+        "RaySensor.cast (64x16)": per_call(lambda: sensor.cast(ray_x, ray_y, ray_heading), 200),
+    }
+
+
+def run(scenarios, scale=1.0, repeats=REPEATS):
+    scene = Scene()
+    results = {
+        "format": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "scenarios": {},
+        "calls": {},
+    }
+    for name in scenarios:
+        build, steps = SCENARIOS[name]
+        results["scenarios"][name] = run_scenario(scene, build, max(int(steps * scale), 1), repeats)
+    results["calls"] = call_costs(scene)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Metrics worse than baseline by more than tolerance (a fraction), as
+    (section, name, metric, baseline value, current value)"""
+    regressions = []
+    for section in ("scenarios", "calls"):
+        for name, old_metrics in baseline.get(section, {}).items():
+            new_metrics = results[section].get(name)
+            if new_metrics is None:
+                continue
+            for metric, higher_is_better in HIGHER_IS_BETTER.items():
+                old, new = old_metrics.get(metric), new_metrics.get(metric)
+                if not old or new is None:
+                    continue
+                change = new / old - 1
+                if abs(new - old) <= NOISE_FLOOR.get(metric, 0):
+                    continue
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append((section, name, metric, old, new))
+    return regressions
+
+
+def print_results(results):
+    for name, metrics in results["scenarios"].items():
+        print(f"{name:28} {metrics['steps_per_s']:10.0f} steps/s {metrics['frames_per_s']:8.0f} frames/s"
+              f" {metrics['peak_kib']:10.0f} KiB peak")
+    for name, metrics in results["calls"].items():
+        print(f"{name:28} {metrics['us_per_call']:10.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only this scenario (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's step count")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="runs of each scenario, the fastest counting")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown as a fraction of the baseline (default {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    results = run(args.scenario or list(SCENARIOS), args.scale, args.repeats)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for section, name, metric, old, new in regressions:
+            print(f"REGRESSION {section}/{name} {metric}: {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
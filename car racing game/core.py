@@ -0,0 +1,568 @@
+"""Simulation core: assets, cars, level state and collision rules.
+
+Nothing here opens a window, so the game logic can be imported, tested and
+stepped headlessly (e.g. under the SDL dummy video driver).
+"""
+import math
+import os
+import time
+from collections import namedtuple
+from functools import lru_cache
+import pygame
+from asset_cache import load_image, load_mask
+from physics import SpatialHash, collide_cars
+from profiler import Profiler
+from skins import SkinCache, LIVERIES, BASE_SPRITE
+from telemetry import WALL, CAR
+from track import get_racing_line, get_progress_field, get_distance_field, RaceProgress
+from utils import to_display_format, blit_rotate_center, get_rotated_mask, get_half_extents, get_shape
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs")
+
+TRACK_SCALE = 0.9
+GRASS_SCALE = 2.5
+CAR_SCALE = 0.55
+# Every car is a livery of one sprite (see skins.py)
+CAR_NAMES = list(LIVERIES)
+
+FINISH_POSITION = (130, 250)
+PATH = [(164, 121), (68, 136), (68, 479), (294, 707), (392, 670), (419, 535),
+        (539, 480), (606, 679), (654, 729), (731, 643), (739, 404), (458, 365),
+        (417, 273), (688, 253), (732, 136), (665, 76), (350, 76), (287, 163),
+        (276, 380), (192, 396), (166, 251)]
+
+# Simulation steps per second. This is fixed, not a setting: every physics
+# quantity (car speeds, acceleration and turn rates, the per-level speed-up,
+# particle lifetimes and friction, cloud speeds) is in units per 1/60 s step,
+# so another rate would change how fast the game runs in real time
+SIM_RATE = 60
+SIM_STEP = 1 / SIM_RATE
+
+
+class Assets:
+    """Scaled track and car surfaces plus the collision masks built from them.
+    cars maps each named livery to its sprite; skins makes any others"""
+
+    def __init__(self, grass, track, track_border, finish, skins, track_border_mask=None, finish_mask=None):
+        self.grass = grass
+        self.track = track
+        self.track_border = track_border
+        self.finish = finish
+        self.skins = skins
+        self.cars = skins.liveries
+        if track_border_mask is None:
+            track_border_mask = pygame.mask.from_surface(track_border)
+        if finish_mask is None:
+            finish_mask = pygame.mask.from_surface(finish)
+        self.track_border_mask = track_border_mask
+        self.finish_mask = finish_mask
+
+    @property
+    def size(self):
+        return self.track.get_size()
+
+    def converted(self):
+        """Copy of these assets in the display pixel format, sharing the masks.
+        Needs an open display"""
+        return Assets(to_display_format(self.grass), to_display_format(self.track),
+                      to_display_format(self.track_border), to_display_format(self.finish),
+                      self.skins.converted(),
+                      self.track_border_mask, self.finish_mask)
+
+
+@lru_cache(maxsize=None)
+def hit_circle_layout(img):
+    """Row of equal circles along a car sprite that covers its opaque pixels.
+
+    Returns each circle's distance from the sprite's centre, front first,
+    and their radius. The end circles sit as far in as the sprite's rounded
+    nose and tail allow, and the ones between are close enough to leave no
+    gaps along the sides.
+    """
+    half_width, half_length = get_half_extents(img)
+    radius = half_width + 1
+    mask = pygame.mask.from_surface(img)
+    width, height = img.get_size()
+    end = 0
+    for x in range(width):
+        for y in range(height):
+            if mask.get_at((x, y)):
+                across, along = abs(x + 0.5 - width / 2), abs(y + 0.5 - height / 2)
+                end = max(end, along - math.sqrt(max(radius * radius - across * across, 0)))
+
+    max_gap = 2 * math.sqrt(radius * radius - half_width * half_width)
+    count = math.ceil(2 * end / max_gap) + 1
+    return [end - 2 * end * i / (count - 1) for i in range(count)], radius
+
+
+def finish_center():
+    width, height = load_assets().finish.get_size()
+    return FINISH_POSITION[0] + width / 2, FINISH_POSITION[1] + height / 2
+
+
+def _path(name):
+    return os.path.join(IMG_DIR, name)
+
+
+@lru_cache(maxsize=None)
+def load_assets():
+    """Load every scaled image and mask once per process, through the on-disk
+    asset cache. No display is needed"""
+    track_border = load_image(_path("track-border.png"), TRACK_SCALE)
+    finish = load_image(_path("finish.png"))
+    return Assets(load_image(_path("grass.jpg"), GRASS_SCALE),
+                  load_image(_path("track.png"), TRACK_SCALE),
+                  track_border,
+                  finish,
+                  SkinCache(load_image(_path(BASE_SPRITE), CAR_SCALE)),
+                  load_mask(_path("track-border.png"), TRACK_SCALE, track_border),
+                  load_mask(_path("finish.png"), 1, finish))
+
+
+class GameInfo():
+    LEVELS = 10
+
+    def __init__(self, level=1, clock=time.time):
+        self.level = level
+        self.started = False
+        self.level_start_time = 0
+        self.clock = clock
+
+    def next_level(self):
+        self.level += 1
+        self.started = False
+
+    def reset(self):
+        self.level = 1
+        self.started = False
+        self.level_start_time = 0
+
+    def game_finished(self):
+        return self.level > self.LEVELS
+
+    def start_level(self):
+        self.started = True
+        self.level_start_time = self.clock()
+
+    def get_level_time(self):
+        if not self.started:
+            return 0
+        return round(self.clock() - self.level_start_time)
+
+
+class AbstractCar:
+    IMG_NAME = None
+
+    def __init__(self, max_vel, rotation_vel, img=None):
+        self.img = img if img is not None else load_assets().cars[self.IMG_NAME]
+        self.max_vel = max_vel
+        self.vel = 0
+        self.rotation_vel = rotation_vel
+        self.angle = 0
+        self.x, self.y = self.START_POS
+        self.acceleration = 0.1
+        self.save_pose()
+
+    def rotate(self, left=False, right=False):
+        if left:
+            self.angle += self.rotation_vel
+        elif right:
+            self.angle -= self.rotation_vel
+
+    def save_pose(self):
+        """Remember the pose at the start of a simulation step for interpolation"""
+        self.previous_pose = (self.x, self.y, self.angle)
+
+    def interpolated_pose(self, alpha):
+        prev_x, prev_y, prev_angle = self.previous_pose
+        return (prev_x + (self.x - prev_x) * alpha,
+                prev_y + (self.y - prev_y) * alpha,
+                prev_angle + (self.angle - prev_angle) * alpha)
+
+    def draw(self, win, alpha=1.0):
+        x, y, angle = self.interpolated_pose(alpha)
+        return blit_rotate_center(win, self.img, (x, y), angle)
+
+    def move_forward(self):
+        self.vel = min(self.vel + self.acceleration, self.max_vel)
+        self.move()
+
+    def move_backward(self):
+        self.vel = max(self.vel - self.acceleration, -self.max_vel/2)
+        self.move()
+
+    def move(self):
+        radians = math.radians(self.angle)
+        vertical = math.cos(radians) * self.vel
+        horizontal = math.sin(radians) * self.vel
+        self.y -= vertical
+        self.x -= horizontal
+
+    def rect_center(self):
+        """Middle of the unrotated sprite, which the car rotates around"""
+        return self.x + self.img.get_width() / 2, self.y + self.img.get_height() / 2
+
+    def hit_circles(self, pose):
+        """Circles covering the car at pose (x, y, angle): centres and a shared radius"""
+        x, y, angle = pose
+        spacings, radius = hit_circle_layout(get_shape(self.img))
+        radians = math.radians(angle)
+        ax, ay = math.sin(radians), math.cos(radians)
+        cx, cy = x + self.img.get_width() / 2, y + self.img.get_height() / 2
+        return [(cx - ax * spacing, cy - ay * spacing) for spacing in spacings], radius
+
+    def sweep(self, field):
+        """Sweep the car through its move this step against a DistanceField.
+
+        Returns (fraction of the move at first contact, contact normal), or
+        None if the move is clear.
+        """
+        if self.previous_pose == (self.x, self.y, self.angle):
+            return None
+        (prev_x, prev_y, _), (x, y) = self.previous_pose, (self.x, self.y)
+        move = math.hypot(x - prev_x, y - prev_y)
+        spacings, radius = hit_circle_layout(get_shape(self.img))
+        center_x, center_y = self.rect_center()
+        # One lookup clears the whole car when the wall is far from a circle around all of it
+        if field.distance(center_x, center_y) - (spacings[0] + radius) > move:
+            return None
+
+        start, radius = self.hit_circles(self.previous_pose)
+        end, _ = self.hit_circles((self.x, self.y, self.angle))
+        contact = None
+        for (x0, y0), (x1, y1) in zip(start, end):
+            t = field.sweep(x0, y0, x1, y1, radius)
+            if t is not None and (contact is None or t < contact[0]):
+                contact = (t, x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+
+        if contact is None:
+            return None
+        t, x, y = contact
+        return t, field.normal(x, y)
+
+    def collide(self, mask, x=0, y=0):
+        car_mask, (dx, dy) = get_rotated_mask(self.img, self.angle)
+        offset = (int(self.x + dx - x), int(self.y + dy - y))
+        # Mask.overlap only tests the area the masks share, so it needs no rect check first
+        poi = mask.overlap(car_mask, offset)
+        return poi
+
+    def reset(self):
+        self.x, self.y = self.START_POS
+        self.angle = 0
+        self.vel = 0
+        self.save_pose()
+
+class PlayerCar(AbstractCar):
+    IMG_NAME = "Red"
+    START_POS = (180, 200)
+
+    def __init__(self, max_vel, rotation_vel, car_img=None):
+        super().__init__(max_vel, rotation_vel, car_img)
+
+    def reduce_speed(self):
+        self.vel = max(self.vel - self.acceleration/2, 0)
+        self.move()
+
+    def bounce(self):
+        self.vel = -self.vel
+        self.move()
+
+    def slide(self, t, normal, field):
+        """Stop the move at the point of contact and carry on along the wall.
+
+        The part of the move that was left loses its component into the wall,
+        and the speed drops to what was already running along it.
+        """
+        prev_x, prev_y, _ = self.previous_pose
+        dx, dy = self.x - prev_x, self.y - prev_y
+        nx, ny = normal
+        into = (dx * nx + dy * ny) * (1 - t)
+        self.x = prev_x + dx - min(into, 0) * nx
+        self.y = prev_y + dy - min(into, 0) * ny
+
+        length = math.hypot(dx, dy)
+        if length:
+            along = (dx * nx + dy * ny) / length
+            self.vel *= math.sqrt(max(0.0, 1 - along * along))
+
+        # Turning on the spot can still swing the car into the wall; push it back out
+        circles, radius = self.hit_circles((self.x, self.y, self.angle))
+        for cx, cy in circles:
+            clearance = field.distance(cx, cy) - radius
+            if clearance < 0:
+                nx, ny = field.normal(cx, cy)
+                self.x -= clearance * nx
+                self.y -= clearance * ny
+
+class ComputerCar(AbstractCar):
+    IMG_NAME = "Green"
+    START_POS = (150, 200)
+    # How far along the racing line the car aims, in pixels
+    LOOKAHEAD = 24
+
+    def __init__(self, max_vel, rotation_vel, path=[], img=None, racing_line=None):
+        super().__init__(max_vel, rotation_vel, img)
+        self.path = path
+        self.current_point = 0
+        # Speed for the current level, which the car returns to after a knock
+        self.cruise_vel = self.vel = max_vel
+        # With a racing line the car follows the smoothed line instead of visiting path points
+        self.racing_line = racing_line
+        if racing_line is not None:
+            self.line_index = racing_line.nearest(*self.rect_center())
+            self.corner_speeds = racing_line.corner_speeds(rotation_vel, self.LOOKAHEAD).tolist()
+
+    def draw_points(self, win):
+        for point in self.path:
+            pygame.draw.circle(win, (255, 0, 0), point, 5)
+
+    def draw(self, win, alpha=1.0):
+        #self.draw_points(win)
+        return super().draw(win, alpha)
+
+    def calculate_angle(self):
+        self.steer_towards(*self.path[self.current_point])
+
+    def steer_towards(self, target_x, target_y):
+        x_diff = target_x - self.x
+        y_diff = target_y - self.y
+
+        if y_diff == 0:
+            desired_radian_angle = math.pi/2
+        else:
+            desired_radian_angle = math.atan(x_diff / y_diff)
+
+        if target_y > self.y:
+            desired_radian_angle += math.pi
+
+        difference_in_angle = self.angle - math.degrees(desired_radian_angle)
+        if difference_in_angle > 180:
+            difference_in_angle -= 360
+
+        if difference_in_angle > 0:
+            self.angle -= min(self.rotation_vel, abs(difference_in_angle))
+        else:
+            self.angle += min(self.rotation_vel, abs(difference_in_angle))
+
+    def update_path_point(self):
+        target = self.path[self.current_point]
+        rect = pygame.Rect(self.x, self.y, self.img.get_width(), self.img.get_height())
+        if rect.collidepoint(*target):
+            self.current_point += 1
+
+
+    def follow_racing_line(self):
+        # The line is followed by the middle of the car, which it rotates around
+        center_x, center_y = self.rect_center()
+        line = self.racing_line
+        self.line_index = line.advance_one(self.line_index, center_x, center_y)
+        target_x, target_y = line.target_ahead(self.line_index, self.LOOKAHEAD)
+        self.steer_towards(target_x - (center_x - self.x), target_y - (center_y - self.y))
+
+        # Ease off for the corner ahead
+        self.vel = min(self.vel + self.acceleration, self.cruise_vel, self.corner_speeds[self.line_index])
+        super().move()
+
+    def move(self):
+        if self.racing_line is not None:
+            self.follow_racing_line()
+            return
+        if self.current_point >= len(self.path):
+            return
+
+        self.calculate_angle()
+        self.update_path_point()
+        self.vel = min(self.vel + self.acceleration, self.cruise_vel)
+        super().move()
+
+    def reset(self):
+        super().reset()
+        self.cruise_vel = self.max_vel
+        if self.racing_line is not None:
+            self.line_index = self.racing_line.nearest(*self.rect_center())
+
+    def next_level(self, level):
+        self.reset()
+        self.cruise_vel = self.vel = self.max_vel + (level - 1) * 0.2
+
+
+# One step of player input, from the keyboard or a script
+Controls = namedtuple("Controls", "left right forward backward", defaults=(False, False, False, False))
+IDLE = Controls()
+FULL_THROTTLE = Controls(forward=True)
+
+
+def apply_controls(player_car, controls):
+    moved = False
+
+    if controls.left:
+        player_car.rotate(left=True)
+    if controls.right:
+        player_car.rotate(right=True)
+    if controls.forward:
+        moved = True
+        player_car.move_forward()
+    if controls.backward:
+        moved = True
+        player_car.move_backward()
+    if not moved:
+        player_car.reduce_speed()
+
+
+def handle_collision(player_car, computer_car, game_info, particle_system=None,
+                     on_lose=None, on_level_complete=None):
+    """Apply border, finish line and level progression rules for one step.
+
+    on_lose(game_info) and on_level_complete(game_info) are called before the
+    level state changes, so they can still read the level and its time.
+    """
+    assets = load_assets()
+    collision_occurred = False
+
+    # Swept against the border's distance field, so fast cars cannot tunnel through it
+    border = get_distance_field(assets.track_border_mask)
+    contact = player_car.sweep(border)
+    if contact is not None:
+        player_car.slide(*contact, border)
+        if particle_system:
+            particle_system.add_collision_particles(player_car.x, player_car.y)
+        collision_occurred = True
+
+    computer_finish_poi_collide = computer_car.collide(assets.finish_mask, *FINISH_POSITION)
+    if computer_finish_poi_collide != None:
+        if on_lose:
+            on_lose(game_info)
+        game_info.reset()
+        player_car.reset()
+        computer_car.reset()
+
+    player_finish_poi_collide = player_car.collide(assets.finish_mask, *FINISH_POSITION)
+    if player_finish_poi_collide != None:
+        if player_finish_poi_collide[1] == 0:
+            player_car.bounce()
+            if particle_system:
+                particle_system.add_collision_particles(player_car.x, player_car.y)
+        else:
+            if on_level_complete:
+                on_level_complete(game_info)
+            game_info.next_level()
+            player_car.reset()
+            computer_car.next_level(game_info.level)
+
+    return collision_occurred
+
+
+class Race:
+    """A player car against a computer car, advanced one fixed step at a time.
+
+    Callbacks (on_lose, on_level_complete, on_win) receive the GameInfo before
+    the state they report on is reset. With no clock given, level times are
+    measured in simulated steps, so a race runs identically at any speed.
+
+    progress tracks laps and the running order of cars, in that order, while
+    a level is being raced. A telemetry recorder, if given, gets a row per step,
+    and the stages of each step are timed into profiler while it is enabled.
+    """
+
+    def __init__(self, player_car=None, computer_car=None, game_info=None, particle_system=None,
+                 on_lose=None, on_level_complete=None, on_win=None, telemetry=None,
+                 profiler=None):
+        self.steps = 0
+        self.player_car = player_car or PlayerCar(4.5, 4.5)
+        self.computer_car = computer_car or ComputerCar(3, 3, PATH, racing_line=get_racing_line(PATH))
+        self.game_info = game_info or GameInfo(clock=self.sim_time)
+        self.particle_system = particle_system
+        self.on_lose = on_lose
+        self.on_level_complete = on_level_complete
+        self.on_win = on_win
+        self.telemetry = telemetry
+        self.profiler = profiler or Profiler()
+        self.cars = [self.player_car, self.computer_car]
+        self.spatial_hash = SpatialHash()
+        self.progress = RaceProgress(get_progress_field(PATH, load_assets().size, finish_center()),
+                                     len(self.cars))
+        # Built here rather than on the first step that needs it
+        get_distance_field(load_assets().track_border_mask)
+
+    def sim_time(self):
+        return self.steps * SIM_STEP
+
+    def step(self, controls):
+        """Advance one step with the player's controls. Returns True if the player hit a wall"""
+        self.steps += 1
+        self.player_car.save_pose()
+        self.computer_car.save_pose()
+
+        scope = self.profiler.scope
+        with scope("player controls"):
+            apply_controls(self.player_car, controls)
+        with scope("computer move"):
+            self.computer_car.move()
+
+        # Cars push each other apart first; the border sweep then covers any push into a wall
+        with scope("car collisions"):
+            car_contacts = collide_cars(self.cars, self.spatial_hash)
+        if self.particle_system:
+            for x, y in car_contacts:
+                self.particle_system.add_collision_particles(x, y)
+
+        with scope("handle_collision"):
+            collision_occurred = handle_collision(self.player_car, self.computer_car, self.game_info,
+                                                  self.particle_system, self.on_lose, self.on_level_complete)
+
+        # A level that just ended has put the cars back on the grid
+        if self.game_info.started:
+            field = self.progress.field
+            self.progress.update([field.progress(*car.rect_center()) for car in self.cars])
+        else:
+            self.progress.reset()
+
+        if self.telemetry:
+            self.telemetry.record(self, collision_occurred * WALL | bool(car_contacts) * CAR)
+
+        if self.game_info.game_finished():
+            if self.on_win:
+                self.on_win(self.game_info)
+            self.reset()
+
+        return collision_occurred
+
+    def reset(self):
+        self.game_info.reset()
+        self.player_car.reset()
+        self.computer_car.reset()
+        self.progress.reset()
+
+
+RaceResult = namedtuple("RaceResult", "outcome level steps sim_time wall_time")
+
+
+def run_headless(controls=None, max_steps=100000, level=1, telemetry=None):
+    """Run one race as fast as possible, without rendering or waits.
+
+    controls is either a Controls value used every step or a callable taking
+    the Race and returning the Controls for the next step. The race ends when
+    the computer car wins, all levels are completed or max_steps is reached.
+    """
+    outcome = []
+    race = Race(on_lose=lambda game_info: outcome.append(("lost", game_info.level)),
+                on_win=lambda game_info: outcome.append(("won", game_info.LEVELS)),
+                telemetry=telemetry)
+    race.game_info.level = level
+    race.computer_car.next_level(level)
+    race.game_info.start_level()
+
+    if controls is None:
+        controls = FULL_THROTTLE
+    next_controls = controls if callable(controls) else (lambda race: controls)
+
+    start = time.perf_counter()
+    while not outcome and race.steps < max_steps:
+        # Every level starts as soon as the previous one is complete
+        if not race.game_info.started:
+            race.game_info.start_level()
+        race.step(next_controls(race))
+
+    result, final_level = outcome[0] if outcome else ("timeout", race.game_info.level)
+    return RaceResult(result, final_level, race.steps, race.sim_time(), time.perf_counter() - start)
@@ -0,0 +1,350 @@
+"""Gym-style environments for training driving agents on the game's physics.
+
+    env = RacingEnv()
+    obs, info = env.reset()
+    obs, reward, terminated, truncated, info = env.step(action)
+
+    with VecEnv(256, workers=8) as envs:
+        obs = envs.reset()
+        obs, rewards, terminated, truncated = envs.step(actions)
+
+An action is the player's controls packed into 4 bits, as in replays
+(bit 0 left, 1 right, 2 forward, 3 backward). Each step is one Race.step, so
+agents drive with the same movement, wall sliding, finish line and level
+rules as the game. An episode is one level: it ends when either car crosses
+the finish line, or is truncated after max_steps.
+
+Given rays (angles from the car's heading, see sensors.py), observations
+also carry the distance to the track border along each ray, as a fraction
+of the sensors' range.
+
+VecEnv steps many environments in worker processes. Observations, actions,
+rewards and done flags live in shared-memory NumPy arrays; the pipes to the
+workers only carry one-byte commands.
+
+    python env.py --envs 64 --workers 4   # measure steps/s with random actions
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from core import Race, PlayerCar, load_assets
+from replay import PLAYER_MAX_VEL, PLAYER_ROTATION_VEL, unpack_controls
+from sensors import RaySensor
+
+ACTIONS = [unpack_controls(bits) for bits in range(16)]
+
+# player x, y, sin and cos of its angle, speed, lap progress,
+# computer x, y, and the gap to the computer in laps
+OBSERVATION_SIZE = 9
+
+# Reward per lap of progress along the racing line, per wall contact and for how a level ends
+LAP_REWARD = 10.0
+WALL_PENALTY = 0.05
+LEVEL_COMPLETE_REWARD = 10.0
+LOST_PENALTY = 10.0
+
+def observation_size(rays=None):
+    return OBSERVATION_SIZE + len(rays or ())
+
+
+# Worker commands and replies
+STEP, RESET, CLOSE, DONE = b"s", b"r", b"c", b"d"
+
+
+class RacingEnv:
+    """One player car racing the computer car through a level"""
+
+    observation_size = OBSERVATION_SIZE
+    action_count = len(ACTIONS)
+
+    def __init__(self, level=1, max_steps=3000, max_vel=PLAYER_MAX_VEL, rotation_vel=PLAYER_ROTATION_VEL,
+                 rays=None):
+        self.level = level
+        self.max_steps = max_steps
+        self.race = Race(PlayerCar(max_vel, rotation_vel),
+                         on_lose=lambda game_info: self.end("lost"),
+                         on_level_complete=lambda game_info: self.end("level complete"))
+        self.width, self.height = load_assets().size
+        self.lap_length = self.race.progress.field.line.length
+        self.sensor = RaySensor(rays) if rays else None
+        self.observation_size = observation_size(rays)
+        self.steps = 0
+        self.outcome = None
+        self.final_observation = None
+        self.distance = 0.0
+
+    def end(self, outcome):
+        """Called as the level ends, before the race puts the cars back on the grid"""
+        self.outcome = outcome
+        race = self.race
+        field = race.progress.field
+        race.progress.update([field.progress(*car.rect_center()) for car in race.cars])
+        self.final_observation = self.observe()
+
+    def reset(self, seed=None):
+        """Put both cars on the grid of the env's level. The physics has no
+        randomness, so seed is accepted for API compatibility only"""
+        race = self.race
+        race.reset()
+        race.game_info.level = self.level
+        race.computer_car.next_level(self.level)
+        race.game_info.start_level()
+        self.steps = 0
+        self.outcome = None
+        self.final_observation = None
+        # Progress from the grid, so the first step's reward and laps count from here
+        field = race.progress.field
+        race.progress.update([field.progress(*car.rect_center()) for car in race.cars])
+        self.distance = race.progress.distance()[0]
+        return self.observe(), {}
+
+    def step(self, action):
+        reward, terminated, truncated, info = self.advance(action)
+        # A finished level's observation is from where it ended, not the grid it reset to
+        obs = self.final_observation if terminated else self.observe()
+        return obs, reward, terminated, truncated, info
+
+    def advance(self, action):
+        """step() without building the observation"""
+        race = self.race
+        collided = race.step(ACTIONS[action])
+        self.steps += 1
+
+        terminated = self.outcome is not None
+        if terminated:
+            # The cars are already back on the grid; only the outcome counts
+            reward = LEVEL_COMPLETE_REWARD if self.outcome == "level complete" else -LOST_PENALTY
+        else:
+            distance = race.progress.distance()[0]
+            reward = (distance - self.distance) / self.lap_length * LAP_REWARD
+            self.distance = distance
+        if collided:
+            reward -= WALL_PENALTY
+
+        truncated = not terminated and self.steps >= self.max_steps
+        info = {"outcome": self.outcome} if terminated else {}
+        return reward, terminated, truncated, info
+
+    def observe(self, out=None, sense=True):
+        """The observation vector, written into out if given. Without sense
+        the ray readings are left as they are, for cast_rays() to fill in"""
+        if out is None:
+            out = np.empty(self.observation_size, dtype=np.float32)
+        race = self.race
+        player, computer = race.player_car, race.computer_car
+        radians = math.radians(player.angle)
+        player_distance, computer_distance = race.progress.distance()
+        out[:OBSERVATION_SIZE] = (player.x / self.width, player.y / self.height, math.sin(radians), math.cos(radians),
+                  player.vel / player.max_vel, race.progress.progress[0] / self.lap_length,
+                  computer.x / self.width, computer.y / self.height,
+                  (player_distance - computer_distance) / self.lap_length)
+        if self.sensor is not None and sense:
+            cast_rays([self], out[None])
+        return out
+
+
+def cast_rays(envs, out):
+    """Write the ray readings of envs (sharing one set of rays) into the rows
+    of out, casting the rays of all their cars at once"""
+    sensor = envs[0].sensor
+    out[:, OBSERVATION_SIZE:] = sensor.cast_cars([env.race.player_car for env in envs]) / sensor.max_range
+
+
+# Shape and dtype of each shared buffer, for num_envs environments
+def _buffer_specs(num_envs, size):
+    return {
+        "obs": ((num_envs, size), np.float32),
+        "final_obs": ((num_envs, size), np.float32),
+        "actions": ((num_envs,), np.uint8),
+        "rewards": ((num_envs,), np.float32),
+        "terminated": ((num_envs,), np.bool_),
+        "truncated": ((num_envs,), np.bool_),
+    }
+
+
+def _attach(names, num_envs, size):
+    """Open the shared buffers by name, returning (SharedMemory list, {name: array})"""
+    memories, arrays = [], {}
+    for name, (shape, dtype) in _buffer_specs(num_envs, size).items():
+        memory = SharedMemory(name=names[name])
+        memories.append(memory)
+        arrays[name] = np.ndarray(shape, dtype, buffer=memory.buf)
+    return memories, arrays
+
+
+def _worker(conn, names, num_envs, start, stop, env_kwargs):
+    """Run environments start..stop, reading actions from and writing results to the shared buffers"""
+    memories, arrays = _attach(names, num_envs, observation_size(env_kwargs.get("rays")))
+    try:
+        envs = [RacingEnv(**env_kwargs) for _ in range(start, stop)]
+        sensing = envs[0].sensor is not None
+        obs, final_obs = arrays["obs"][start:stop], arrays["final_obs"][start:stop]
+        actions, rewards = arrays["actions"][start:stop], arrays["rewards"][start:stop]
+        terminated, truncated = arrays["terminated"][start:stop], arrays["truncated"][start:stop]
+        conn.send_bytes(DONE)
+
+        while True:
+            command = conn.recv_bytes()
+            if command == STEP:
+                for i, env in enumerate(envs):
+                    rewards[i], terminated[i], truncated[i], _ = env.advance(actions[i])
+                    env.observe(obs[i], sense=False)
+                if sensing:
+                    cast_rays(envs, obs)
+                # Finished episodes start over at once; their last observation is kept apart
+                finished = np.flatnonzero(terminated | truncated)
+                if len(finished):
+                    final_obs[finished] = obs[finished]
+                    for i in finished:
+                        # Terminated levels were observed before the cars went back to the grid
+                        if terminated[i]:
+                            final_obs[i] = envs[i].final_observation
+                        envs[i].reset()
+                        envs[i].observe(obs[i], sense=False)
+                    if sensing:
+                        rows = obs[finished]
+                        cast_rays([envs[i] for i in finished], rows)
+                        obs[finished] = rows
+            elif command == RESET:
+                for i, env in enumerate(envs):
+                    env.reset()
+                    env.observe(obs[i], sense=False)
+                if sensing:
+                    cast_rays(envs, obs)
+            elif command == CLOSE:
+                break
+            conn.send_bytes(DONE)
+    except Exception:
+        conn.send_bytes(traceback.format_exc().encode())
+    finally:
+        arrays = obs = final_obs = actions = rewards = terminated = truncated = None
+        for memory in memories:
+            memory.close()
+        conn.close()
+
+
+class VecEnv:
+    """num_envs RacingEnvs split evenly across worker processes.
+
+    step() returns (obs, rewards, terminated, truncated) as arrays over all
+    environments. Environments that finished are reset straight away, so
+    their obs row is the first of the next episode; the last observation of
+    the finished one is in final_obs.
+    """
+
+    def __init__(self, num_envs, workers=None, start_method=None, **env_kwargs):
+        self.num_envs = num_envs
+        self.observation_size = observation_size(env_kwargs.get("rays"))
+        workers = max(1, min(workers or os.cpu_count() or 1, num_envs))
+        context = multiprocessing.get_context(start_method)
+
+        self.memories = {}
+        self.arrays = {}
+        for name, (shape, dtype) in _buffer_specs(num_envs, self.observation_size).items():
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            memory = self.memories[name] = SharedMemory(create=True, size=max(size, 1))
+            self.arrays[name] = np.ndarray(shape, dtype, buffer=memory.buf)
+            self.arrays[name].fill(0)
+        names = {name: memory.name for name, memory in self.memories.items()}
+
+        self.conns = []
+        self.processes = []
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_worker, daemon=True,
+                                      args=(child_conn, names, num_envs, int(start), int(stop), env_kwargs))
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+        self.closed = False
+        self._wait()
+
+    @property
+    def final_obs(self):
+        return self.arrays["final_obs"]
+
+    def _wait(self):
+        for conn in self.conns:
+            reply = conn.recv_bytes()
+            if reply != DONE:
+                self.close()
+                raise RuntimeError(f"environment worker failed:\n{reply.decode()}")
+
+    def _command(self, command):
+        for conn in self.conns:
+            conn.send_bytes(command)
+        self._wait()
+
+    def reset(self):
+        self._command(RESET)
+        return self.arrays["obs"].copy()
+
+    def step(self, actions):
+        arrays = self.arrays
+        arrays["actions"][:] = actions
+        self._command(STEP)
+        return (arrays["obs"].copy(), arrays["rewards"].copy(),
+                arrays["terminated"].copy(), arrays["truncated"].copy())
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self.conns:
+            try:
+                conn.send_bytes(CLOSE)
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self.conns:
+            conn.close()
+        # Views into the buffers must go before the buffers can be closed
+        self.arrays = {}
+        for memory in self.memories.values():
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure environment steps per second with random actions")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--steps", type=int, default=500, help="steps of every environment")
+    parser.add_argument("--rays", type=int, default=0, help="distance sensor rays per car, spread over 180 degrees")
+    args = parser.parse_args()
+    rays = list(np.linspace(-90, 90, args.rays)) if args.rays else None
+
+    rng = np.random.default_rng(0)
+    with VecEnv(args.envs, args.workers, rays=rays) as envs:
+        envs.reset()
+        episodes = 0
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            # Mostly forward, steering at random
+            actions = 4 | rng.integers(0, 3, args.envs)
+            _, _, terminated, truncated = envs.step(actions)
+            episodes += int(terminated.sum() + truncated.sum())
+        elapsed = time.perf_counter() - start
+    total = args.envs * args.steps
+    print(f"{total} steps in {elapsed:.2f}s: {total / elapsed:.0f} steps/s across {len(envs.processes)} workers, "
+          f"{episodes} episodes finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Run races without a window, as fast as the CPU allows.
+
+    python headless.py --races 100 --script full-throttle
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+from collections import Counter
+from core import run_headless, IDLE, FULL_THROTTLE
+from telemetry import TelemetryRecorder
+
+SCRIPTS = {
+    "idle": IDLE,
+    "full-throttle": FULL_THROTTLE,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--races", type=int, default=1)
+    parser.add_argument("--level", type=int, default=1, help="level the races start at")
+    parser.add_argument("--max-steps", type=int, default=100000)
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="full-throttle",
+                        help="player input used for every step")
+    parser.add_argument("--telemetry", metavar="PATH", help="record every step of every race to PATH")
+    args = parser.parse_args()
+
+    telemetry = TelemetryRecorder(args.telemetry) if args.telemetry else None
+
+    outcomes = Counter()
+    total_steps = 0
+    total_time = 0.0
+    for _ in range(args.races):
+        result = run_headless(SCRIPTS[args.script], args.max_steps, args.level, telemetry)
+        outcomes[result.outcome] += 1
+        total_steps += result.steps
+        total_time += result.wall_time
+        print(f"{result.outcome:8} level {result.level:2}  {result.steps} steps  {result.sim_time:.1f}s simulated")
+
+    print(f"{dict(outcomes)}  {total_steps / max(total_time, 1e-9):.0f} steps/s")
+    if telemetry:
+        telemetry.close()
+
+
+if __name__ == "__main__":
+    main()
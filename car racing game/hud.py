@@ -0,0 +1,106 @@
+import pygame
+from utils import create_gradient_surface, render_text
+
+BAR_WIDTH, BAR_HEIGHT = 200, 12
+
+
+def speed_color(speed):
+    """Color coding for the speed readout"""
+    if speed > 4:
+        return (255, 150, 150)  # Red for very fast
+    if speed > 3:
+        return (255, 255, 100)  # Yellow for fast
+    return (255, 255, 255)
+
+
+def speed_bar_colors(speed_ratio):
+    if speed_ratio < 0.5:
+        return (0, 150, 0), (0, 255, 0)
+    if speed_ratio < 0.8:
+        return (150, 150, 0), (255, 255, 0)
+    return (150, 0, 0), (255, 0, 0)
+
+
+def _copy_region(dest, source, area):
+    """Overwrite area of dest with the same area of source, alpha included"""
+    dest.fill((0, 0, 0, 0), area)
+    dest.blit(source, area, area, special_flags=pygame.BLEND_RGBA_ADD)
+
+
+class Hud:
+    """Bottom-left status panel (level, time, speed and speed bar).
+
+    The panel is kept as one composited layer. Each widget remembers the
+    value it last displayed and is only re-rendered into the layer when that
+    value changes, so a typical frame costs a single blit.
+    """
+
+    def __init__(self, height, font):
+        self.font = font
+        panel = pygame.Rect(5, height - 125, 280, 120)
+        text_height = font.get_height()
+
+        # Screen-space areas of each widget
+        self.widget_areas = {
+            "level": pygame.Rect(20, height - text_height - 105, 260, text_height),
+            "time": pygame.Rect(20, height - text_height - 80, 260, text_height),
+            "speed": pygame.Rect(20, height - text_height - 55, 260, text_height),
+            "bar": pygame.Rect(19, height - 31, BAR_WIDTH + 2, BAR_HEIGHT + 2),
+        }
+        self.rect = panel.unionall(list(self.widget_areas.values()))
+        self.values = {}
+
+        # Static parts: translucent gradient panel, its border and the empty speed bar
+        self.base = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.base.blit(create_gradient_surface(panel.width, panel.height, (20, 20, 40), (40, 40, 80)),
+                       self._local(panel))
+        self.base.fill((255, 255, 255, 200), self._local(panel), special_flags=pygame.BLEND_RGBA_MULT)
+        pygame.draw.rect(self.base, (100, 150, 255), self._local(panel), 2)
+        bar = self._local(self.widget_areas["bar"]).inflate(-2, -2)
+        self.base.blit(create_gradient_surface(BAR_WIDTH, BAR_HEIGHT, (30, 30, 30), (60, 60, 60)), bar)
+
+        self.layer = self.base.copy()
+
+    def _local(self, rect):
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def _changed(self, widget, value):
+        """Record value for widget and restore its area if the value differs"""
+        if self.values.get(widget, None) == value:
+            return None
+        self.values[widget] = value
+        area = self._local(self.widget_areas[widget])
+        _copy_region(self.layer, self.base, area)
+        return area
+
+    def _draw_text(self, widget, text, color):
+        area = self._changed(widget, (text, color))
+        if area is not None:
+            self.layer.blit(render_text(self.font, text, color), area)
+
+    def draw(self, win, player_car, game_info):
+        # Level display with better styling and glow effect
+        self._draw_text("level", f"LEVEL {game_info.level}", (100, 200, 255))
+
+        # Time display with icon-like prefix
+        self._draw_text("time", f"⏱ TIME: {game_info.get_level_time()}s", (255, 255, 255))
+
+        # Speed display with color coding and better formatting
+        speed = round(player_car.vel, 1)
+        self._draw_text("speed", f"🏎 SPEED: {speed}", speed_color(speed))
+
+        # Speed bar fill with dynamic color
+        speed_ratio = min(player_car.vel / player_car.max_vel, 1.0)
+        fill_width = int(BAR_WIDTH * speed_ratio)
+        bar_colors = speed_bar_colors(speed_ratio)
+        area = self._changed("bar", (fill_width, bar_colors))
+        if area is not None:
+            bar = area.inflate(-2, -2)
+            if fill_width > 0:
+                self.layer.blit(create_gradient_surface(fill_width, BAR_HEIGHT, *bar_colors, vertical=False), bar)
+
+            # Border for speed bar with glow effect
+            pygame.draw.rect(self.layer, (150, 200, 255), area, 2)
+            pygame.draw.rect(self.layer, (255, 255, 255), bar, 1)
+
+        return win.blit(self.layer, self.rect)
@@ -1,25 +1,41 @@
 import pygame
+import os
+import sys
 import time
 import math
 import random
-from utils import scale_image, blit_rotate_center, blit_text_center, create_gradient_surface
+from utils import create_gradient_surface, get_font, render_text, bake_layers, warm_rotation_cache, prune_files
+from core import load_assets, SIM_STEP, PlayerCar, ComputerCar, GameInfo, Race, Controls, FINISH_POSITION, PATH
+from particles import ParticleSystem
+from hud import Hud
+from renderer import DirtyRectRenderer
+from track import get_racing_line
+from replay import Replay, subsystem_rngs, PLAYER_MAX_VEL, PLAYER_ROTATION_VEL
+from telemetry import TelemetryRecorder
+from profiler import Profiler
+from scenes import Scene, SceneRunner
 pygame.font.init()
 
-GRASS = scale_image(pygame.image.load("imgs/grass.jpg"), 2.5)
-TRACK = scale_image(pygame.image.load("imgs/track.png"), 0.9)
+ASSETS = load_assets()
 
-TRACK_BORDER = scale_image(pygame.image.load("imgs/track-border.png"), 0.9)
-TRACK_BORDER_MASK = pygame.mask.from_surface(TRACK_BORDER)
+WIDTH, HEIGHT = ASSETS.size
+WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+pygame.display.set_caption("Racing Game!")
+
+# With the display open, every surface is converted to its pixel format
+ASSETS = ASSETS.converted()
+GRASS = ASSETS.grass
+TRACK = ASSETS.track
+
+TRACK_BORDER = ASSETS.track_border
 
-FINISH = pygame.image.load("imgs/finish.png")
-FINISH_MASK = pygame.mask.from_surface(FINISH)
-FINISH_POSITION = (130, 250)
+FINISH = ASSETS.finish
 
-RED_CAR = scale_image(pygame.image.load("imgs/red-car.png"), 0.55)
-GREEN_CAR = scale_image(pygame.image.load("imgs/green-car.png"), 0.55)
-GREY_CAR = scale_image(pygame.image.load("imgs/grey-car.png"), 0.55)
-PURPLE_CAR = scale_image(pygame.image.load("imgs/purple-car.png"), 0.55)
-WHITE_CAR = scale_image(pygame.image.load("imgs/white-car.png"), 0.55)
+RED_CAR = ASSETS.cars["Red"]
+GREEN_CAR = ASSETS.cars["Green"]
+GREY_CAR = ASSETS.cars["Grey"]
+PURPLE_CAR = ASSETS.cars["Purple"]
+WHITE_CAR = ASSETS.cars["White"]
 
 # Car selection data
 CARS = {
@@ -29,404 +45,174 @@ CARS = {
     "Purple": PURPLE_CAR,
     "White": WHITE_CAR
 }
-
-WIDTH, HEIGHT = TRACK.get_width(), TRACK.get_height()
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Racing Game!")
-
-MAIN_FONT = pygame.font.SysFont("comicsans", 25)
-TITLE_FONT = pygame.font.SysFont("arial", 40, bold=True)
-INFO_FONT = pygame.font.SysFont("arial", 20)
-
-FPS = 60
-PATH = [(164, 121), (68, 136), (68, 479), (294, 707), (392, 670), (419, 535),
-        (539, 480), (606, 679), (654, 729), (731, 643), (739, 404), (458, 365),
-        (417, 273), (688, 253), (732, 136), (665, 76), (350, 76), (287, 163),
-        (276, 380), (192, 396), (166, 251)]
-
-class GameInfo():
-    LEVELS = 10
-
-    def __init__(self, level=1):
-        self.level = level
-        self.started = False
-        self.level_start_time = 0
-
-    def next_level(self):
-        self.level += 1
-        self.started = False
-
-    def reset(self):
-        self.level = 1
-        self.started = False
-        self.level_start_time = 0
-
-    def game_finished(self):
-        return self.level > self.LEVELS
-
-    def start_level(self):
-        self.started = True
-        self.level_start_time = time.time()
-
-    def get_level_time(self):
-        if not self.started:
-            return 0
-        return round(time.time() - self.level_start_time)
-
-
-class AbstractCar:
-    def __init__(self, max_vel, rotation_vel):
-        self.img=self.IMG
-        self.max_vel = max_vel
-        self.vel = 0
-        self.rotation_vel = rotation_vel
-        self.angle = 0
-        self.x, self.y = self.START_POS
-        self.acceleration = 0.1
-
-    def rotate(self, left=False, right=False):
-        if left:
-            self.angle += self.rotation_vel
-        elif right:
-            self.angle -= self.rotation_vel
-
-    def draw(self, win):
-        blit_rotate_center(win, self.img, (self.x, self.y), self.angle)
-
-    def move_forward(self):
-        self.vel = min(self.vel + self.acceleration, self.max_vel)
-        self.move()
-
-    def move_backward(self):
-        self.vel = max(self.vel - self.acceleration, -self.max_vel/2)
-        self.move()
-
-    def move(self):
-        radians = math.radians(self.angle)
-        vertical = math.cos(radians) * self.vel
-        horizontal = math.sin(radians) * self.vel
-        self.y -= vertical
-        self.x -= horizontal
-
-    def collide(self, mask, x=0, y=0):
-        car_mask = pygame.mask.from_surface(self.img)
-        offset = (int(self.x - x), int(self.y - y))
-        poi = mask.overlap(car_mask, offset)
-        return poi
-
-    def reset(self):
-        self.x, self.y = self.START_POS
-        self.angle = 0
-        self.vel = 0
-
-class PlayerCar(AbstractCar):
-    IMG = RED_CAR
-    START_POS = (180, 200)
-
-    def __init__(self, max_vel, rotation_vel, car_img=None):
-        if car_img:
-            self.IMG = car_img
-        super().__init__(max_vel, rotation_vel)
-
-    def reduce_speed(self):
-        self.vel = max(self.vel - self.acceleration/2, 0)
-        self.move()
-
-    def bounce(self):
-        self.vel = -self.vel
-        self.move()
-
-class ComputerCar(AbstractCar):
-    IMG = GREEN_CAR
-    START_POS = (150, 200)
-
-    def __init__(self, max_vel, rotation_vel, path=[]):
-        super().__init__(max_vel, rotation_vel)
-        self.path = path
-        self.current_point = 0
-        self.vel = max_vel
-
-    def draw_points(self, win):
-        for point in self.path:
-            pygame.draw.circle(win, (255, 0, 0), point, 5)
-
-    def draw(self, win):
-        super().draw(win)
-        #self.draw_points(win)
-
-    def calculate_angle(self):
-        target_x, target_y = self.path[self.current_point]
-        x_diff = target_x - self.x
-        y_diff = target_y - self.y
-
-        if y_diff == 0:
-            desired_radian_angle = math.pi/2
+warm_rotation_cache(CARS.values())
+
+# The highlighted car on the selection screen, scaled once here rather than every redraw
+SELECTED_SCALE = 1.2
+SELECTED_CARS = {name: ASSETS.skins.get(name, SELECTED_SCALE) for name in CARS}
+
+# Static track layers flattened into one opaque surface, blitted once per frame
+TRACK_BACKGROUND = bake_layers((WIDTH, HEIGHT), [(GRASS, (0, 0)), (TRACK, (0, 0)),
+                                                 (FINISH, FINISH_POSITION), (TRACK_BORDER, (0, 0))])
+
+MAIN_FONT = get_font("comicsans", 25)
+TITLE_FONT = get_font("arial", 40, bold=True)
+INFO_FONT = get_font("arial", 20)
+MINIMAP_FONT = get_font("arial", 12)
+PROFILER_FONT = get_font("couriernew", 14)
+
+HUD = Hud(HEIGHT, INFO_FONT)
+
+# Minimap track outline, scaled once from every 16th racing line sample
+MINIMAP_SIZE = 120
+MINIMAP_TRACK = [(int(x * MINIMAP_SIZE / WIDTH), int(y * MINIMAP_SIZE / HEIGHT))
+                 for x, y in get_racing_line(PATH).point_list[::16]]
+# Its translucent background, made once: a copy, as the gradient is shared
+MINIMAP_BG = create_gradient_surface(MINIMAP_SIZE, MINIMAP_SIZE, (20, 20, 40), (40, 40, 80)).copy()
+MINIMAP_BG.set_alpha(200)
+
+# Restore and present only the regions that changed each frame instead of the whole window
+DIRTY_RECT_RENDERING = False
+RENDERER = DirtyRectRenderer(TRACK_BACKGROUND) if DIRTY_RECT_RENDERING else None
+
+# The simulation advances in fixed steps of SIM_STEP (1 / SIM_RATE, see core.py)
+# seconds, independent of the render rate. Rendering is capped at RENDER_FPS (0 for
+# uncapped) and a slow frame catches up with at most MAX_STEPS_PER_FRAME steps
+# before time is dropped.
+RENDER_FPS = 144
+MAX_STEPS_PER_FRAME = 5
+
+# Level start countdown (0 starts on the key press), and how long each result screen stays up
+COUNTDOWN_SECONDS = 3
+LEVEL_COMPLETE_SECONDS = 2
+LOST_SECONDS = 3
+WON_SECONDS = 5
+
+# Every race is recorded and saved here on exit; `python main.py <replay file>` plays one back.
+# Only the newest REPLAYS_KEPT are kept
+SAVE_REPLAYS = True
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+REPLAYS_KEPT = 50
+
+# Car states, collisions and level times for every step, streamed to a file (see telemetry.py).
+# Off by default; when on, only the newest TELEMETRY_KEPT files are kept
+RECORD_TELEMETRY = False
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry")
+TELEMETRY_KEPT = 20
+
+# Frame stage timings: F3 toggles collection and the overlay, F4 saves the recent frames to PROFILE_DIR
+PROFILER = Profiler()
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+def draw(win, images, player_car, computer_car, game_info, particle_system, animated_bg,
+         race_progress, alpha=1.0):
+    """Render one frame. alpha is how far (0..1) the frame lies between the
+    previous and the current simulation step, used to interpolate the cars"""
+    scope = PROFILER.scope
+    with scope("draw track"):
+        if RENDERER:
+            RENDERER.begin(win)
         else:
-            desired_radian_angle = math.atan(x_diff / y_diff)
-
-        if target_y > self.y:
-            desired_radian_angle += math.pi
-
-        difference_in_angle = self.angle - math.degrees(desired_radian_angle)
-        if difference_in_angle > 180:
-            difference_in_angle -= 360
-
-        if difference_in_angle > 0:
-            self.angle -= min(self.rotation_vel, abs(difference_in_angle))
-        else:
-            self.angle += min(self.rotation_vel, abs(difference_in_angle))
-
-    def update_path_point(self):
-        target = self.path[self.current_point]
-        rect = pygame.Rect(self.x, self.y, self.img.get_width(), self.img.get_height())
-        if rect.collidepoint(*target):
-            self.current_point += 1
-
-
-    def move(self):
-        if self.current_point >= len(self.path):
-            return
-
-        self.calculate_angle()
-        self.update_path_point()
-        super().move()
-
-    def next_level(self, level):
-        self.reset()
-        self.vel = self.max_vel + (level - 1) * 0.2
-
-
-class Particle:
-    def __init__(self, x, y, color, vel_x, vel_y, life_time):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.vel_x = vel_x
-        self.vel_y = vel_y
-        self.life_time = life_time
-        self.max_life = life_time
-        self.size = random.randint(2, 5)
-
-    def update(self):
-        self.x += self.vel_x
-        self.y += self.vel_y
-        self.life_time -= 1
-        self.vel_x *= 0.98  # Friction
-        self.vel_y *= 0.98
-
-    def draw(self, win):
-        if self.life_time > 0:
-            alpha = int(255 * (self.life_time / self.max_life))
-            color_with_alpha = (*self.color, alpha)
-            # Create a surface for alpha blending
-            particle_surf = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
-            pygame.draw.circle(particle_surf, color_with_alpha, (self.size, self.size), self.size)
-            win.blit(particle_surf, (self.x - self.size, self.y - self.size))
-
-    def is_alive(self):
-        return self.life_time > 0
-
-
-class ParticleSystem:
-    def __init__(self):
-        self.particles = []
-
-    def add_exhaust_particles(self, car_x, car_y, car_angle, car_vel):
-        if car_vel > 0.5:  # Only add particles when moving
-            # Calculate exhaust position behind the car
-            radians = math.radians(car_angle + 180)  # Behind the car
-            exhaust_x = car_x + math.sin(radians) * 20
-            exhaust_y = car_y + math.cos(radians) * 20
-
-            for _ in range(2):
-                vel_x = random.uniform(-1, 1) + math.sin(radians) * car_vel * 0.3
-                vel_y = random.uniform(-1, 1) + math.cos(radians) * car_vel * 0.3
-                color = (100, 100, 100) if random.random() > 0.5 else (80, 80, 80)
-                self.particles.append(Particle(exhaust_x, exhaust_y, color, vel_x, vel_y, 30))
-
-    def add_collision_particles(self, x, y):
-        for _ in range(10):
-            vel_x = random.uniform(-3, 3)
-            vel_y = random.uniform(-3, 3)
-            color = (255, 255, 0) if random.random() > 0.5 else (255, 200, 0)
-            self.particles.append(Particle(x, y, color, vel_x, vel_y, 20))
-
-    def add_speed_particles(self, car_x, car_y, car_angle, car_vel):
-        if car_vel > 3:  # Only add speed lines when going fast
-            for _ in range(3):
-                # Create particles around the car
-                offset_x = random.uniform(-15, 15)
-                offset_y = random.uniform(-15, 15)
-                vel_x = random.uniform(-2, 2)
-                vel_y = random.uniform(-2, 2)
-                color = (255, 255, 255)
-                self.particles.append(Particle(car_x + offset_x, car_y + offset_y, color, vel_x, vel_y, 15))
-
-    def update(self):
-        for particle in self.particles[:]:
-            particle.update()
-            if not particle.is_alive():
-                self.particles.remove(particle)
-
-    def draw(self, win):
-        for particle in self.particles:
-            particle.draw(win)
-
-
-
-def draw(win, images, player_car, computer_car, game_info, particle_system, animated_bg):
-    for img, pos in images:
-        win.blit(img, pos)
+            for img, pos in images:
+                win.blit(img, pos)
 
     # Draw animated background elements
-    animated_bg.draw(win)
+    with scope("draw background"):
+        dirty = animated_bg.draw(win)
 
     # Draw particles behind cars
-    particle_system.draw(win)
-
-    # Enhanced UI with gradient background panels
-    ui_panel = create_gradient_surface(280, 120, (20, 20, 40), (40, 40, 80))
-    ui_panel.set_alpha(200)
-    win.blit(ui_panel, (5, HEIGHT - 125))
-
-    # Add border to UI panel
-    pygame.draw.rect(win, (100, 150, 255), (5, HEIGHT - 125, 280, 120), 2)
-
-    # Level display with better styling and glow effect
-    level_text = INFO_FONT.render(f"LEVEL {game_info.level}", 1, (100, 200, 255))
-    win.blit(level_text, (20, HEIGHT - level_text.get_height() - 105))
-
-    # Time display with icon-like prefix
-    time_text = INFO_FONT.render(f"⏱ TIME: {game_info.get_level_time()}s", 1, (255, 255, 255))
-    win.blit(time_text, (20, HEIGHT - time_text.get_height() - 80))
-
-    # Speed display with color coding and better formatting
-    speed = round(player_car.vel, 1)
-    speed_color = (255, 255, 255)
-    if speed > 3:
-        speed_color = (255, 255, 100)  # Yellow for fast
-    if speed > 4:
-        speed_color = (255, 150, 150)  # Red for very fast
-
-    vel_text = INFO_FONT.render(f"🏎 SPEED: {speed}", 1, speed_color)
-    win.blit(vel_text, (20, HEIGHT - vel_text.get_height() - 55))
-
-    # Enhanced speed bar with gradient
-    bar_width = 200
-    bar_height = 12
-    bar_x = 20
-    bar_y = HEIGHT - 30
-
-    # Background bar with gradient
-    bg_gradient = create_gradient_surface(bar_width, bar_height, (30, 30, 30), (60, 60, 60))
-    win.blit(bg_gradient, (bar_x, bar_y))
-
-    # Speed bar fill with dynamic color
-    speed_ratio = min(player_car.vel / player_car.max_vel, 1.0)
-    fill_width = int(bar_width * speed_ratio)
-
-    if fill_width > 0:
-        if speed_ratio < 0.5:
-            bar_color1, bar_color2 = (0, 150, 0), (0, 255, 0)
-        elif speed_ratio < 0.8:
-            bar_color1, bar_color2 = (150, 150, 0), (255, 255, 0)
-        else:
-            bar_color1, bar_color2 = (150, 0, 0), (255, 0, 0)
+    with scope("draw particles"):
+        dirty += particle_system.draw(win)
 
-        speed_gradient = create_gradient_surface(fill_width, bar_height, bar_color1, bar_color2, vertical=False)
-        win.blit(speed_gradient, (bar_x, bar_y))
-
-    # Border for speed bar with glow effect
-    pygame.draw.rect(win, (150, 200, 255), (bar_x - 1, bar_y - 1, bar_width + 2, bar_height + 2), 2)
-    pygame.draw.rect(win, (255, 255, 255), (bar_x, bar_y, bar_width, bar_height), 1)
+    # Status panel, re-rendered only where its values changed
+    with scope("draw hud"):
+        dirty.append(HUD.draw(win, player_car, game_info))
 
     # Minimap
-    draw_minimap(win, player_car, computer_car)
+    with scope("draw minimap"):
+        dirty.append(draw_minimap(win, player_car, computer_car, race_progress))
 
     # Performance indicators
-    draw_performance_indicators(win, player_car, computer_car, game_info)
+    with scope("draw indicators"):
+        dirty += draw_performance_indicators(win, race_progress, game_info)
+
+    with scope("draw cars"):
+        dirty.append(player_car.draw(win, alpha))
+        dirty.append(computer_car.draw(win, alpha))
 
-    player_car.draw(win)
-    computer_car.draw(win)
-    pygame.display.update()
+    profiler_rect = PROFILER.draw(win, PROFILER_FONT)
+    if profiler_rect:
+        dirty.append(profiler_rect)
+
+    with scope("present"):
+        if RENDERER:
+            RENDERER.present(dirty)
+        else:
+            pygame.display.update()
 
 
-def draw_minimap(win, player_car, computer_car):
+def draw_minimap(win, player_car, computer_car, race_progress):
     """Draw a minimap in the top-right corner"""
-    minimap_size = 120
-    minimap_x = WIDTH - minimap_size - 20
+    minimap_x = WIDTH - MINIMAP_SIZE - 20
     minimap_y = 20
 
     # Minimap background
-    minimap_bg = create_gradient_surface(minimap_size, minimap_size, (20, 20, 40), (40, 40, 80))
-    minimap_bg.set_alpha(200)
-    win.blit(minimap_bg, (minimap_x, minimap_y))
+    win.blit(MINIMAP_BG, (minimap_x, minimap_y))
 
     # Minimap border
-    pygame.draw.rect(win, (100, 150, 255), (minimap_x, minimap_y, minimap_size, minimap_size), 2)
+    pygame.draw.rect(win, (100, 150, 255), (minimap_x, minimap_y, MINIMAP_SIZE, MINIMAP_SIZE), 2)
 
     # Scale factor for minimap
-    scale_x = minimap_size / WIDTH
-    scale_y = minimap_size / HEIGHT
+    scale_x = MINIMAP_SIZE / WIDTH
+    scale_y = MINIMAP_SIZE / HEIGHT
 
-    # Draw track outline on minimap (simplified)
-    track_points = [(164, 121), (68, 136), (68, 479), (294, 707), (392, 670), (419, 535),
-                   (539, 480), (606, 679), (654, 729), (731, 643), (739, 404), (458, 365),
-                   (417, 273), (688, 253), (732, 136), (665, 76), (350, 76), (287, 163)]
-
-    minimap_track_points = []
-    for point in track_points:
-        mini_x = minimap_x + int(point[0] * scale_x)
-        mini_y = minimap_y + int(point[1] * scale_y)
-        minimap_track_points.append((mini_x, mini_y))
-
-    if len(minimap_track_points) > 2:
-        pygame.draw.lines(win, (100, 100, 100), True, minimap_track_points, 2)
+    # Track outline, taken from the racing line
+    minimap_track_points = [(minimap_x + x, minimap_y + y) for x, y in MINIMAP_TRACK]
+    pygame.draw.lines(win, (100, 100, 100), True, minimap_track_points, 2)
 
     # Draw finish line on minimap
     finish_mini_x = minimap_x + int(FINISH_POSITION[0] * scale_x)
     finish_mini_y = minimap_y + int(FINISH_POSITION[1] * scale_y)
     pygame.draw.circle(win, (255, 255, 0), (finish_mini_x, finish_mini_y), 3)
 
-    # Draw cars on minimap
-    player_mini_x = minimap_x + int(player_car.x * scale_x)
-    player_mini_y = minimap_y + int(player_car.y * scale_y)
-    pygame.draw.circle(win, (255, 100, 100), (player_mini_x, player_mini_y), 3)
-
-    computer_mini_x = minimap_x + int(computer_car.x * scale_x)
-    computer_mini_y = minimap_y + int(computer_car.y * scale_y)
-    pygame.draw.circle(win, (100, 255, 100), (computer_mini_x, computer_mini_y), 3)
+    # Draw cars on minimap, the race leader ringed in white
+    leader = race_progress.order()[0]
+    for i, (car, color) in enumerate([(player_car, (255, 100, 100)), (computer_car, (100, 255, 100))]):
+        car_x, car_y = car.rect_center()
+        mini_pos = (minimap_x + int(car_x * scale_x), minimap_y + int(car_y * scale_y))
+        if i == leader:
+            pygame.draw.circle(win, (255, 255, 255), mini_pos, 5, 1)
+        pygame.draw.circle(win, color, mini_pos, 3)
 
     # Minimap title
-    minimap_title = pygame.font.SysFont("arial", 12).render("MAP", 1, (255, 255, 255))
+    minimap_title = render_text(MINIMAP_FONT, "MAP", (255, 255, 255))
     win.blit(minimap_title, (minimap_x + 5, minimap_y + 5))
 
+    return pygame.Rect(minimap_x, minimap_y, MINIMAP_SIZE, MINIMAP_SIZE)
 
-def draw_performance_indicators(win, player_car, computer_car, game_info):
-    """Draw additional performance indicators"""
-    # Position comparison
-    player_distance = calculate_distance_to_finish(player_car)
-    computer_distance = calculate_distance_to_finish(computer_car)
 
-    position_text = "LEADING" if player_distance < computer_distance else "BEHIND"
-    position_color = (100, 255, 100) if player_distance < computer_distance else (255, 100, 100)
+def draw_performance_indicators(win, race_progress, game_info):
+    """Draw additional performance indicators"""
+    # Race position of the player (car 0), from progress along the track
+    place = race_progress.positions()[0]
+    position_text = f"{place}/{len(race_progress.laps)}"
+    position_color = (100, 255, 100) if place == 1 else (255, 100, 100)
 
-    pos_text = INFO_FONT.render(f"POSITION: {position_text}", 1, position_color)
-    win.blit(pos_text, (WIDTH - 250, HEIGHT - 40))
+    pos_text = render_text(INFO_FONT, f"POSITION: {position_text}", position_color)
+    pos_rect = win.blit(pos_text, (WIDTH - 250, HEIGHT - 40))
 
     # Level progress indicator
     progress = min(game_info.level / game_info.LEVELS, 1.0)
-    progress_text = INFO_FONT.render(f"PROGRESS: {int(progress * 100)}%", 1, (255, 255, 255))
-    win.blit(progress_text, (WIDTH - 250, HEIGHT - 20))
+    progress_text = render_text(INFO_FONT, f"PROGRESS: {int(progress * 100)}%", (255, 255, 255))
+    progress_rect = win.blit(progress_text, (WIDTH - 250, HEIGHT - 20))
 
-
-def calculate_distance_to_finish(car):
-    """Calculate approximate distance to finish line"""
-    return math.sqrt((car.x - FINISH_POSITION[0])**2 + (car.y - FINISH_POSITION[1])**2)
+    return [pos_rect, progress_rect]
 
 
 class AnimatedBackground:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.time = 0
         self.clouds = []
         self.create_clouds()
@@ -435,11 +221,11 @@ class AnimatedBackground:
         """Create animated cloud effects"""
         for _ in range(5):
             cloud = {
-                'x': random.randint(-100, WIDTH + 100),
-                'y': random.randint(50, 200),
-                'speed': random.uniform(0.2, 0.8),
-                'size': random.randint(20, 40),
-                'alpha': random.randint(30, 80)
+                'x': self.rng.randint(-100, WIDTH + 100),
+                'y': self.rng.randint(50, 200),
+                'speed': self.rng.uniform(0.2, 0.8),
+                'size': self.rng.randint(20, 40),
+                'alpha': self.rng.randint(30, 80)
             }
             self.clouds.append(cloud)
 
@@ -451,18 +237,22 @@ class AnimatedBackground:
             cloud['x'] += cloud['speed']
             if cloud['x'] > WIDTH + 100:
                 cloud['x'] = -100
-                cloud['y'] = random.randint(50, 200)
+                cloud['y'] = self.rng.randint(50, 200)
 
     def draw(self, win):
+        """Draw clouds and the finish line effect, returning the rects drawn to"""
+        rects = []
+
         # Draw animated clouds
         for cloud in self.clouds:
             cloud_surface = pygame.Surface((cloud['size'] * 2, cloud['size']), pygame.SRCALPHA)
             pygame.draw.ellipse(cloud_surface, (255, 255, 255, cloud['alpha']),
                               (0, 0, cloud['size'] * 2, cloud['size']))
-            win.blit(cloud_surface, (cloud['x'], cloud['y']))
+            rects.append(win.blit(cloud_surface, (cloud['x'], cloud['y'])))
 
         # Draw animated finish line effect
-        self.draw_finish_line_effect(win)
+        rects += self.draw_finish_line_effect(win)
+        return rects
 
     def draw_finish_line_effect(self, win):
         """Draw animated finish line with checkered pattern"""
@@ -489,7 +279,10 @@ class AnimatedBackground:
 
         glow_surface = pygame.Surface((80, 40), pygame.SRCALPHA)
         pygame.draw.rect(glow_surface, glow_color, (0, 0, 80, 40), 3)
-        win.blit(glow_surface, (finish_x - 5, finish_y - 5))
+        glow_rect = win.blit(glow_surface, (finish_x - 5, finish_y - 5))
+
+        checker_rect = pygame.Rect(finish_x, finish_y, 8 * checker_size, 4 * checker_size)
+        return [checker_rect, glow_rect]
 
 
 class SoundManager:
@@ -517,140 +310,72 @@ class SoundManager:
             # Placeholder for menu navigation sound
             pass
 
-def move_player(player_car):
+def keyboard_controls():
     keys = pygame.key.get_pressed()
-    moved = False
-
-    if keys[pygame.K_a]:
-        player_car.rotate(left=True)
-    if keys[pygame.K_d]:
-        player_car.rotate(right=True)
-    if keys[pygame.K_w]:
-        moved = True
-        player_car.move_forward()
-    if keys[pygame.K_s]:
-        moved = True
-        player_car.move_backward()
-    if not moved:
-        player_car.reduce_speed()
-
-def handle_collision(player_car, computer_car, game_info, particle_system):
-    collision_occurred = False
-
-    if player_car.collide(TRACK_BORDER_MASK) != None:
-        player_car.bounce()
-        particle_system.add_collision_particles(player_car.x, player_car.y)
-        collision_occurred = True
-
-    computer_finish_poi_collide = computer_car.collide(FINISH_MASK, *FINISH_POSITION)
-    if computer_finish_poi_collide != None:
-        # Enhanced lose screen
-        lose_screen(WIN, game_info)
-        game_info.reset()
-        player_car.reset()
-        computer_car.reset()
-
-    player_finish_poi_collide = player_car.collide(FINISH_MASK, *FINISH_POSITION)
-    if player_finish_poi_collide != None:
-        if player_finish_poi_collide[1] == 0:
-            player_car.bounce()
-            particle_system.add_collision_particles(player_car.x, player_car.y)
-        else:
-            # Enhanced level complete screen
-            level_complete_screen(WIN, game_info)
-            game_info.next_level()
-            player_car.reset()
-            computer_car.next_level(game_info.level)
+    return Controls(left=keys[pygame.K_a], right=keys[pygame.K_d],
+                    forward=keys[pygame.K_w], backward=keys[pygame.K_s])
 
-    return collision_occurred
-
-
-def lose_screen(win, game_info):
-    # Create overlay
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((255, 0, 0, 100))  # Red tint
-    win.blit(overlay, (0, 0))
-
-    # Main text
-    lose_text = TITLE_FONT.render("YOU LOST!", 1, (255, 255, 255))
-    text_rect = lose_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50))
-
-    # Text shadow
-    shadow_text = TITLE_FONT.render("YOU LOST!", 1, (0, 0, 0))
-    shadow_rect = shadow_text.get_rect(center=(WIDTH//2 + 3, HEIGHT//2 - 47))
-
-    win.blit(shadow_text, shadow_rect)
-    win.blit(lose_text, text_rect)
-
-    # Subtitle
-    subtitle = INFO_FONT.render("The computer car reached the finish line first!", 1, (255, 255, 255))
-    subtitle_rect = subtitle.get_rect(center=(WIDTH//2, HEIGHT//2 + 10))
-    win.blit(subtitle, subtitle_rect)
-
-    # Restart message
-    restart_text = INFO_FONT.render("Restarting in 3 seconds...", 1, (255, 255, 255))
-    restart_rect = restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 40))
-    win.blit(restart_text, restart_rect)
-
-    pygame.display.update()
-    pygame.time.wait(3000)
-
-
-def level_complete_screen(win, game_info):
-    # Create overlay
+def build_overlay(tint, title, lines, title_y=HEIGHT//2 - 50):
+    """Full-window tint with a shadowed title and lines of text below it"""
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 255, 0, 100))  # Green tint
-    win.blit(overlay, (0, 0))
+    overlay.fill(tint)
 
-    # Main text
-    complete_text = TITLE_FONT.render("LEVEL COMPLETE!", 1, (255, 255, 255))
-    text_rect = complete_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50))
+    # Text shadow, then the title over it
+    shadow_text = render_text(TITLE_FONT, title, (0, 0, 0))
+    overlay.blit(shadow_text, shadow_text.get_rect(center=(WIDTH//2 + 3, title_y + 3)))
+    title_text = render_text(TITLE_FONT, title, (255, 255, 255))
+    overlay.blit(title_text, title_text.get_rect(center=(WIDTH//2, title_y)))
 
-    # Text shadow
-    shadow_text = TITLE_FONT.render("LEVEL COMPLETE!", 1, (0, 0, 0))
-    shadow_rect = shadow_text.get_rect(center=(WIDTH//2 + 3, HEIGHT//2 - 47))
+    y = title_y + 60
+    for text, color in lines:
+        line = render_text(INFO_FONT, text, color)
+        overlay.blit(line, line.get_rect(center=(WIDTH//2, y)))
+        y += 30
+    return overlay
 
-    win.blit(shadow_text, shadow_rect)
-    win.blit(complete_text, text_rect)
-
-    # Time display
-    time_text = INFO_FONT.render(f"Completed in {game_info.get_level_time()} seconds!", 1, (255, 255, 255))
-    time_rect = time_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 10))
-    win.blit(time_text, time_rect)
-
-    # Next level message
-    if game_info.level < game_info.LEVELS:
-        next_text = INFO_FONT.render(f"Preparing Level {game_info.level + 1}...", 1, (255, 255, 255))
-    else:
-        next_text = INFO_FONT.render("Preparing final challenge...", 1, (255, 255, 255))
-    next_rect = next_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 40))
-    win.blit(next_text, next_rect)
 
-    pygame.display.update()
-    pygame.time.wait(2000)
+class SelectScene(Scene):
+    """Car selection: A/D to browse, SPACE to race the car in the middle"""
+    idle = True
 
+    def __init__(self, on_select):
+        super().__init__()
+        self.on_select = on_select
 
-def car_selection_screen(win):
-    """Car selection screen that returns the selected car image"""
-    selected_car = 0
-    car_names = list(CARS.keys())
-    car_images = list(CARS.values())
+    def enter(self):
+        self.selected = 0
+        self.needs_redraw = True
 
-    selecting = True
-    clock = pygame.time.Clock()
+    def handle(self, event):
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == pygame.K_a and self.selected > 0:
+            self.selected -= 1
+            self.needs_redraw = True
+        elif event.key == pygame.K_d and self.selected < len(CARS) - 1:
+            self.selected += 1
+            self.needs_redraw = True
+        elif event.key == pygame.K_SPACE:
+            self.on_select(list(CARS)[self.selected])
 
-    while selecting:
-        clock.tick(FPS)
+    def draw(self, win):
+        # Only redraw when the selection changed
+        if not self.needs_redraw:
+            return
+        self.needs_redraw = False
+        selected_car = self.selected
+        car_names = list(CARS.keys())
+        car_images = list(CARS.values())
 
         # Background
         win.fill((20, 20, 40))
 
         # Title
-        title_text = TITLE_FONT.render("SELECT YOUR CAR", 1, (255, 255, 255))
+        title_text = render_text(TITLE_FONT, "SELECT YOUR CAR", (255, 255, 255))
         title_rect = title_text.get_rect(center=(WIDTH//2, 100))
 
         # Title shadow
-        shadow_text = TITLE_FONT.render("SELECT YOUR CAR", 1, (0, 0, 0))
+        shadow_text = render_text(TITLE_FONT, "SELECT YOUR CAR", (0, 0, 0))
         shadow_rect = shadow_text.get_rect(center=(WIDTH//2 + 3, 103))
 
         win.blit(shadow_text, shadow_rect)
@@ -668,8 +393,7 @@ def car_selection_screen(win):
             if -100 < x_pos < WIDTH + 100:
                 # Scale effect for selected car
                 if i == selected_car:
-                    scaled_car = pygame.transform.scale(car_img,
-                        (int(car_img.get_width() * 1.2), int(car_img.get_height() * 1.2)))
+                    scaled_car = SELECTED_CARS[name]
                     # Selection highlight
                     highlight_rect = pygame.Rect(x_pos - 60, y_pos - 60, 120, 120)
                     pygame.draw.rect(win, (100, 200, 255), highlight_rect, 3)
@@ -683,22 +407,22 @@ def car_selection_screen(win):
 
                 # Car name
                 name_color = (255, 255, 255) if i == selected_car else (150, 150, 150)
-                name_text = INFO_FONT.render(name, 1, name_color)
+                name_text = render_text(INFO_FONT, name, name_color)
                 name_rect = name_text.get_rect(center=(x_pos, y_pos + 80))
                 win.blit(name_text, name_rect)
 
         # Instructions
-        instruction_text = INFO_FONT.render("Use A/D to select, SPACE to confirm", 1, (200, 200, 200))
+        instruction_text = render_text(INFO_FONT, "Use A/D to select, SPACE to confirm", (200, 200, 200))
         instruction_rect = instruction_text.get_rect(center=(WIDTH//2, HEIGHT - 100))
         win.blit(instruction_text, instruction_rect)
 
         # Navigation arrows
         if selected_car > 0:
-            left_arrow = INFO_FONT.render("◀", 1, (255, 255, 255))
+            left_arrow = render_text(INFO_FONT, "◀", (255, 255, 255))
             win.blit(left_arrow, (50, car_display_y))
 
         if selected_car < len(car_names) - 1:
-            right_arrow = INFO_FONT.render("▶", 1, (255, 255, 255))
+            right_arrow = render_text(INFO_FONT, "▶", (255, 255, 255))
             right_rect = right_arrow.get_rect()
             right_rect.right = WIDTH - 50
             right_rect.centery = car_display_y
@@ -706,128 +430,276 @@ def car_selection_screen(win):
 
         pygame.display.update()
 
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                return None
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_a and selected_car > 0:
-                    selected_car -= 1
-                elif event.key == pygame.K_d and selected_car < len(car_names) - 1:
-                    selected_car += 1
-                elif event.key == pygame.K_SPACE:
-                    return car_images[selected_car]
-
-    return car_images[selected_car]
-
 
-# Car selection
-selected_car_img = car_selection_screen(WIN)
-if selected_car_img is None:
-    pygame.quit()
-    exit()
-
-run = True
-clock = pygame.time.Clock()
-images = [(GRASS, (0, 0)), (TRACK, (0, 0)), (FINISH, FINISH_POSITION), (TRACK_BORDER, (0, 0))]
-player_car = PlayerCar(4.5, 4.5, selected_car_img)
-computer_car = ComputerCar(3, 3, PATH)
-game_info = GameInfo()
-particle_system = ParticleSystem()
-animated_bg = AnimatedBackground()
-sound_manager = SoundManager()
+class CountdownScene(Scene):
+    """Level start screen: waits for any key, then counts down COUNTDOWN_SECONDS
+    before the level starts"""
+    idle = True
+
+    def enter(self):
+        self.count = None
+        self.deadline = None
+        self.backdrop = None
+        self.needs_redraw = True
+        # The screen may still hold a result overlay, which a dirty-rect
+        # frame would only partly repaint under the backdrop
+        if RENDERER:
+            RENDERER.invalidate()
+        # Recorded levels started on a key press, which took no simulation steps
+        if session.playback is not None:
+            self.start()
+
+    def start(self):
+        session.game_info.start_level()
+        self.runner.switch("racing")
+
+    def handle(self, event):
+        if event.type != pygame.KEYDOWN or self.count is not None:
+            return
+        if COUNTDOWN_SECONDS:
+            self.count = COUNTDOWN_SECONDS
+            self.deadline = time.perf_counter() + 1
+            self.needs_redraw = True
+        else:
+            self.start()
 
-while run:
-    clock.tick(FPS)
+    def update(self, now):
+        if self.deadline is None or now < self.deadline:
+            return
+        self.count -= 1
+        if self.count == 0:
+            self.start()
+            return
+        self.deadline += 1
+        self.needs_redraw = True
 
-    # Update systems
-    particle_system.update()
-    animated_bg.update()
+    def draw(self, win):
+        if self.backdrop is None:
+            # The grid the level starts from, kept to redraw the overlay over
+            session.draw()
+            self.backdrop = win.copy()
+            self.needs_redraw = True
+        if not self.needs_redraw:
+            return
+        self.needs_redraw = False
 
-    # Add exhaust particles for moving cars
-    particle_system.add_exhaust_particles(player_car.x, player_car.y, player_car.angle, player_car.vel)
-    particle_system.add_exhaust_particles(computer_car.x, computer_car.y, computer_car.angle, computer_car.vel)
+        key = (session.game_info.level, self.count)
+        win.blit(self.backdrop, (0, 0))
+        win.blit(self.cached(key, lambda: self.build_overlay(*key)), (0, 0))
+        pygame.display.update()
 
-    # Add speed particles for fast player car
-    particle_system.add_speed_particles(player_car.x, player_car.y, player_car.angle, player_car.vel)
+    def build_overlay(self, level, count):
+        if count is None:
+            lines = [("Press any key to START!", (255, 255, 255)),
+                     ("", (0, 0, 0)),
+                     ("Controls: WASD to move", (200, 200, 200))]
+        else:
+            lines = [(f"Starting in {count}...", (255, 255, 100))]
+        return build_overlay((0, 0, 0, 150), f"LEVEL {level}", lines)
+
+
+class RacingScene(Scene):
+    """The race itself: fixed simulation steps as real time passes, rendered every frame"""
+    fps = RENDER_FPS
+
+    def enter(self):
+        # Time spent on other screens does not count as simulation time
+        self.accumulator = 0.0
+        self.previous_time = time.perf_counter()
+        if RENDERER:
+            RENDERER.invalidate()
+
+    def handle(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            PROFILER.toggle()
+            if RENDERER:
+                RENDERER.invalidate()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and PROFILER.frames:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            PROFILER.export(os.path.join(PROFILE_DIR, time.strftime("frames-%Y%m%d-%H%M%S.csv")))
+
+    def update(self, now):
+        PROFILER.begin_frame()
+
+        # Run as many fixed simulation steps as the elapsed real time calls for
+        self.accumulator += now - self.previous_time
+        self.previous_time = now
+
+        steps = 0
+        while self.accumulator >= SIM_STEP and steps < MAX_STEPS_PER_FRAME:
+            controls = session.next_controls()
+            if controls is None:
+                self.runner.stop()
+                return
+            session.step(controls)
+            self.accumulator -= SIM_STEP
+            steps += 1
+
+            # A level ended during the step; its screen takes over from here
+            if self.runner.pending:
+                self.runner.advance()
+                return
+
+        # Under load, drop the backlog instead of falling further behind
+        if steps == MAX_STEPS_PER_FRAME:
+            self.accumulator = min(self.accumulator, SIM_STEP)
 
-    # Sound effects (placeholder calls)
-    sound_manager.play_engine_sound(player_car.vel / player_car.max_vel)
+    def draw(self, win):
+        session.draw(self.accumulator / SIM_STEP)
+        PROFILER.end_frame()
 
-    draw(WIN, images, player_car, computer_car, game_info, particle_system, animated_bg)
 
-    while not game_info.started:
-        # Enhanced start screen
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150))
-        WIN.blit(overlay, (0, 0))
+class ResultScene(Scene):
+    """Timed overlay shown after a level ends, drawn once over the last frame"""
+    idle = True
 
-        title_text = TITLE_FONT.render(f"LEVEL {game_info.level}", 1, (255, 255, 255))
-        title_rect = title_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50))
-        WIN.blit(title_text, title_rect)
+    def __init__(self, tint, title, duration):
+        super().__init__()
+        self.tint = tint
+        self.title = title
+        self.duration = duration
 
-        start_text = INFO_FONT.render("Press any key to START!", 1, (255, 255, 255))
-        start_rect = start_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 20))
-        WIN.blit(start_text, start_rect)
+    def enter(self, lines=()):
+        self.lines = tuple(lines)
+        self.deadline = time.perf_counter() + self.duration
+        self.drawn = False
+        # The overlay covers the whole window, so the next frame must too
+        if RENDERER:
+            RENDERER.invalidate()
 
-        # Controls info
-        controls_text = INFO_FONT.render("Controls: WASD to move", 1, (200, 200, 200))
-        controls_rect = controls_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 60))
-        WIN.blit(controls_text, controls_rect)
+    def update(self, now):
+        if now >= self.deadline:
+            self.runner.advance("countdown")
 
+    def draw(self, win):
+        if self.drawn:
+            return
+        self.drawn = True
+        win.blit(self.cached(self.lines, lambda: build_overlay(self.tint, self.title, self.lines)), (0, 0))
         pygame.display.update()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                break
 
-            if event.type == pygame.KEYDOWN:
-                game_info.start_level()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            run = False
-            break
+def lost_lines(game_info):
+    return [("The computer car reached the finish line first!", (255, 255, 255)),
+            (f"Restarting in {LOST_SECONDS} seconds...", (255, 255, 255))]
 
-        #if event.type == pygame.MOUSEBUTTONDOWN:
-            #pos = pygame.mouse.get_pos()
-            #computer_car.path.append(pos)
 
+def level_complete_lines(game_info):
+    if game_info.level < game_info.LEVELS:
+        next_text = f"Preparing Level {game_info.level + 1}..."
+    else:
+        next_text = "Preparing final challenge..."
+    return [(f"Completed in {game_info.get_level_time()} seconds!", (255, 255, 255)),
+            (next_text, (255, 255, 255))]
 
-    move_player(player_car)
-    computer_car.move()
 
-    collision_occurred = handle_collision(player_car, computer_car, game_info, particle_system)
+def won_lines(game_info):
+    return [("You completed all levels!", (255, 255, 255)),
+            (f"Restarting in {WON_SECONDS} seconds...", (255, 255, 255))]
 
-    if game_info.game_finished():
-        # Enhanced win screen
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((255, 215, 0, 150))  # Gold tint
-        WIN.blit(overlay, (0, 0))
 
-        win_text = TITLE_FONT.render("CONGRATULATIONS!", 1, (255, 255, 255))
-        win_rect = win_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50))
+def simulation_step(race, particle_system, animated_bg, sound_manager, controls):
+    """Advance the game by one fixed step of SIM_STEP seconds"""
+    player_car, computer_car = race.player_car, race.computer_car
+
+    # Update systems
+    with PROFILER.scope("particle update"):
+        particle_system.update()
+    with PROFILER.scope("background update"):
+        animated_bg.update()
 
-        shadow_text = TITLE_FONT.render("CONGRATULATIONS!", 1, (0, 0, 0))
-        shadow_rect = shadow_text.get_rect(center=(WIDTH//2 + 3, HEIGHT//2 - 47))
+    # Add exhaust particles for moving cars
+    particle_system.add_exhaust_particles(player_car.x, player_car.y, player_car.angle, player_car.vel)
+    particle_system.add_exhaust_particles(computer_car.x, computer_car.y, computer_car.angle, computer_car.vel)
 
-        WIN.blit(shadow_text, shadow_rect)
-        WIN.blit(win_text, win_rect)
+    # Add speed particles for fast player car
+    particle_system.add_speed_particles(player_car.x, player_car.y, player_car.angle, player_car.vel)
 
-        complete_text = INFO_FONT.render("You completed all levels!", 1, (255, 255, 255))
-        complete_rect = complete_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 10))
-        WIN.blit(complete_text, complete_rect)
+    # Sound effects (placeholder calls)
+    sound_manager.play_engine_sound(player_car.vel / player_car.max_vel)
 
-        restart_text = INFO_FONT.render("Restarting in 5 seconds...", 1, (255, 255, 255))
-        restart_rect = restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 40))
-        WIN.blit(restart_text, restart_rect)
+    race.step(controls)
+
+
+class Session:
+    """One run of the game: the race, its effects and the replay and telemetry recording it.
+    Level endings are queued on runner as result screens"""
+
+    def __init__(self, replay, runner, playback=False):
+        rngs = subsystem_rngs(replay.seed)
+        self.replay = replay
+        # Play back a recorded race: its car, its seeds and its inputs instead of the keyboard
+        self.playback = iter(replay) if playback else None
+
+        self.telemetry = None
+        if RECORD_TELEMETRY:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            self.telemetry = TelemetryRecorder(os.path.join(TELEMETRY_DIR, time.strftime("race-%Y%m%d-%H%M%S.rctl")))
+
+        self.images = [(TRACK_BACKGROUND, (0, 0))]
+        self.player_car = PlayerCar(PLAYER_MAX_VEL, PLAYER_ROTATION_VEL, CARS[replay.car])
+        self.computer_car = ComputerCar(3, 3, PATH, GREEN_CAR, get_racing_line(PATH))
+        self.game_info = GameInfo()
+        self.particle_system = ParticleSystem(rng=rngs["particles"])
+        self.race = Race(self.player_car, self.computer_car, self.game_info, self.particle_system,
+                         on_lose=lambda game_info: runner.push("lost", lines=lost_lines(game_info)),
+                         on_level_complete=lambda game_info: runner.push(
+                             "level complete", lines=level_complete_lines(game_info)),
+                         on_win=lambda game_info: runner.push("won", lines=won_lines(game_info)),
+                         telemetry=self.telemetry, profiler=PROFILER)
+        self.animated_bg = AnimatedBackground(rngs["background"])
+        self.sound_manager = SoundManager()
+
+    def next_controls(self):
+        """The player's controls for the next step, or None when a playback has run out"""
+        if self.playback is not None:
+            return next(self.playback, None)
+        controls = keyboard_controls()
+        self.replay.record(controls)
+        return controls
+
+    def step(self, controls):
+        simulation_step(self.race, self.particle_system, self.animated_bg, self.sound_manager, controls)
+
+    def draw(self, alpha=1.0):
+        draw(WIN, self.images, self.player_car, self.computer_car, self.game_info, self.particle_system,
+             self.animated_bg, self.race.progress, alpha)
+
+    def close(self):
+        if SAVE_REPLAYS and self.playback is None and len(self.replay):
+            self.replay.save(os.path.join(REPLAY_DIR, time.strftime("race-%Y%m%d-%H%M%S.rcr")))
+            prune_files(REPLAY_DIR, ".rcr", REPLAYS_KEPT)
+        if self.telemetry:
+            self.telemetry.close()
+            prune_files(TELEMETRY_DIR, ".rctl", TELEMETRY_KEPT)
+
+
+def start_session(car_name):
+    global session
+    session = Session(Replay(random.randrange(2 ** 32), car=car_name), RUNNER)
+    RUNNER.switch("countdown")
+
+
+RUNNER = SceneRunner(WIN, {
+    "select": SelectScene(start_session),
+    "countdown": CountdownScene(),
+    "racing": RacingScene(),
+    "level complete": ResultScene((0, 255, 0, 100), "LEVEL COMPLETE!", LEVEL_COMPLETE_SECONDS),
+    "lost": ResultScene((255, 0, 0, 100), "YOU LOST!", LOST_SECONDS),
+    "won": ResultScene((255, 215, 0, 150), "CONGRATULATIONS!", WON_SECONDS),
+})
+
+session = None
+
+# Importing the module (as benchmark.py does) sets up the window and assets without running the game
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        session = Session(Replay.load(sys.argv[1]), RUNNER, playback=True)
+        RUNNER.run("countdown")
+    else:
+        RUNNER.run("select")
 
-        pygame.display.update()
-        pygame.time.wait(5000)
-        game_info.reset()
-        player_car.reset()
-        computer_car.reset()
+    if session:
+        session.close()
 
-pygame.quit()
+    pygame.quit()
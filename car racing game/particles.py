@@ -0,0 +1,147 @@
+import math
+from functools import lru_cache
+import numpy as np
+import pygame
+
+FRICTION = 0.98
+MIN_SIZE, MAX_SIZE = 2, 5
+ALPHA_BUCKETS = 16
+
+# Drawn particles are reported to the renderer as tiles of this size
+DIRTY_TILE = 64
+
+# Every color an emitter can produce; particles store an index into this
+PALETTE = (
+    (100, 100, 100), (80, 80, 80),  # Exhaust
+    (255, 255, 0), (255, 200, 0),   # Collision sparks
+    (255, 255, 255),                # Speed lines
+)
+EXHAUST, EXHAUST_DARK, SPARK, SPARK_ORANGE, SPEED = range(len(PALETTE))
+
+
+@lru_cache(maxsize=None)
+def build_particle_atlas():
+    """Pre-render one alpha-blended circle per (size, color, alpha bucket).
+
+    Sprites are stored flat so a particle's sprite is found with
+    atlas_index(size, color, bucket).
+    """
+    atlas = []
+    for size in range(MIN_SIZE, MAX_SIZE + 1):
+        for color in PALETTE:
+            for bucket in range(ALPHA_BUCKETS):
+                alpha = min(int((bucket + 0.5) * 256 / ALPHA_BUCKETS), 255)
+                particle_surf = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+                pygame.draw.circle(particle_surf, (*color, alpha), (size, size), size)
+                atlas.append(particle_surf)
+    return atlas
+
+
+def atlas_index(size, color, bucket):
+    return ((size - MIN_SIZE) * len(PALETTE) + color) * ALPHA_BUCKETS + bucket
+
+
+class ParticleSystem:
+    """Fixed-capacity particle engine stored as parallel NumPy arrays.
+
+    Live particles occupy the first `count` slots of every array. Dead
+    particles are removed by moving live ones from the tail into their slots.
+    """
+
+    def __init__(self, capacity=4096, rng=None):
+        self.capacity = capacity
+        self.count = 0
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.int16)
+        self.max_life = np.ones(capacity, dtype=np.int16)
+        self.size = np.zeros(capacity, dtype=np.int16)
+        self.color = np.zeros(capacity, dtype=np.uint8)
+        self.atlas = build_particle_atlas()
+
+    def spawn(self, pos, vel, color, life_time):
+        """Add a batch of particles. pos and vel are (n, 2) arrays and color holds
+        PALETTE indices. Particles that do not fit in the capacity are dropped."""
+        n = min(len(pos), self.capacity - self.count)
+        if n <= 0:
+            return
+        start, end = self.count, self.count + n
+        self.pos[start:end] = pos[:n]
+        self.vel[start:end] = vel[:n]
+        self.color[start:end] = color[:n]
+        self.life[start:end] = life_time
+        self.max_life[start:end] = life_time
+        self.size[start:end] = self.rng.integers(MIN_SIZE, MAX_SIZE + 1, n)
+        self.count = end
+
+    def _pick_colors(self, n, color1, color2):
+        return np.where(self.rng.random(n) > 0.5, color1, color2)
+
+    def add_exhaust_particles(self, car_x, car_y, car_angle, car_vel, n=2):
+        if car_vel > 0.5:  # Only add particles when moving
+            # Calculate exhaust position behind the car
+            radians = math.radians(car_angle + 180)  # Behind the car
+            direction = np.array([math.sin(radians), math.cos(radians)])
+            exhaust = np.array([car_x, car_y]) + direction * 20
+
+            pos = np.broadcast_to(exhaust, (n, 2))
+            vel = self.rng.uniform(-1, 1, (n, 2)) + direction * car_vel * 0.3
+            color = self._pick_colors(n, EXHAUST, EXHAUST_DARK)
+            self.spawn(pos, vel, color, 30)
+
+    def add_collision_particles(self, x, y, n=10):
+        pos = np.broadcast_to((x, y), (n, 2))
+        vel = self.rng.uniform(-3, 3, (n, 2))
+        color = self._pick_colors(n, SPARK, SPARK_ORANGE)
+        self.spawn(pos, vel, color, 20)
+
+    def add_speed_particles(self, car_x, car_y, car_angle, car_vel, n=3):
+        if car_vel > 3:  # Only add speed lines when going fast
+            # Create particles around the car
+            pos = np.array([car_x, car_y]) + self.rng.uniform(-15, 15, (n, 2))
+            vel = self.rng.uniform(-2, 2, (n, 2))
+            color = np.full(n, SPEED)
+            self.spawn(pos, vel, color, 15)
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+
+        self.pos[:n] += self.vel[:n]
+        self.life[:n] -= 1
+        self.vel[:n] *= FRICTION  # Friction
+
+        dead = np.flatnonzero(self.life[:n] <= 0)
+        if dead.size == 0:
+            return
+
+        # Fill holes below the new count with survivors from above it
+        new_count = n - dead.size
+        holes = dead[dead < new_count]
+        movers = new_count + np.flatnonzero(self.life[new_count:n] > 0)
+        for array in (self.pos, self.vel, self.life, self.max_life, self.size, self.color):
+            array[holes] = array[movers]
+        self.count = new_count
+
+    def draw(self, win):
+        """Draw all live particles and return tile rects covering them"""
+        n = self.count
+        if n == 0:
+            return []
+
+        size = self.size[:n]
+        buckets = self.life[:n].astype(np.int32) * ALPHA_BUCKETS // self.max_life[:n]
+        np.minimum(buckets, ALPHA_BUCKETS - 1, out=buckets)
+        sprites = atlas_index(size, self.color[:n], buckets).tolist()
+        top_left = (self.pos[:n] - size[:, None]).tolist()
+
+        atlas = self.atlas
+        win.blits([(atlas[i], pos) for i, pos in zip(sprites, top_left)], doreturn=False)
+
+        # A sprite starting in a tile can reach 2 * MAX_SIZE pixels past its edge
+        tiles = np.unique(self.pos[:n].astype(np.int32) // DIRTY_TILE, axis=0) * DIRTY_TILE
+        reach = DIRTY_TILE + 2 * MAX_SIZE
+        return [pygame.Rect(x - MAX_SIZE, y - MAX_SIZE, reach, reach) for x, y in tiles.tolist()]
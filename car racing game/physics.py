@@ -0,0 +1,136 @@
+"""Car-to-car collisions: a spatial hash broadphase, oriented-rect narrowphase
+and impulse response.
+
+Cars are anything with x, y (sprite top-left), angle, vel, img and
+rect_center(), i.e. AbstractCar instances. They move only along their
+heading, so the sideways part of an impulse is lost.
+"""
+import math
+from collections import defaultdict
+from itertools import combinations
+from utils import get_half_extents
+
+# Fraction of the closing speed that survives a collision
+RESTITUTION = 0.5
+
+
+class SpatialHash:
+    """Uniform grid of cell_size squares, rebuilt from scratch every step.
+
+    Each car is filed under every cell its bounding box touches, so only cars
+    sharing a cell become candidate pairs. With cells larger than a car, the
+    work grows with the number of cars rather than with the number of pairs.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def rebuild(self, boxes):
+        """File each (left, top, right, bottom) box under its index"""
+        cells = self.cells
+        cells.clear()
+        size = self.cell_size
+        for index, (left, top, right, bottom) in enumerate(boxes):
+            rows = range(int(top // size), int(bottom // size) + 1)
+            for cell_x in range(int(left // size), int(right // size) + 1):
+                for cell_y in rows:
+                    cells[cell_x, cell_y].append(index)
+
+    def pairs(self):
+        """Index pairs (i < j) that share at least one cell"""
+        pairs = set()
+        for members in self.cells.values():
+            if len(members) > 1:
+                pairs.update(combinations(members, 2))
+        return pairs
+
+
+class Body:
+    """A car's oriented rect for one step: centre, unit axes and half extents"""
+
+    def __init__(self, car):
+        self.car = car
+        self.x, self.y = car.rect_center()
+        self.half_width, self.half_length = get_half_extents(car.img)
+        self.radius = math.hypot(self.half_width, self.half_length)
+        radians = math.radians(car.angle)
+        # Forward is the direction AbstractCar.move drives in
+        self.forward = (-math.sin(radians), -math.cos(radians))
+        self.side = (math.cos(radians), -math.sin(radians))
+
+    def extent(self, axis):
+        """Half the length of the rect's shadow on axis"""
+        return (self.half_width * abs(axis[0] * self.side[0] + axis[1] * self.side[1]) +
+                self.half_length * abs(axis[0] * self.forward[0] + axis[1] * self.forward[1]))
+
+
+def overlap(a, b):
+    """Separating axis test between two bodies.
+
+    Returns (normal, depth) with the normal pointing from a to b, or None if
+    the rects are apart.
+    """
+    dx, dy = b.x - a.x, b.y - a.y
+    if dx * dx + dy * dy >= (a.radius + b.radius) ** 2:
+        return None
+
+    best = None
+    for axis in (a.forward, a.side, b.forward, b.side):
+        distance = dx * axis[0] + dy * axis[1]
+        depth = a.extent(axis) + b.extent(axis) - abs(distance)
+        if depth <= 0:
+            return None
+        if best is None or depth < best[1]:
+            best = ((axis[0], axis[1]) if distance >= 0 else (-axis[0], -axis[1])), depth
+    return best
+
+
+def resolve(a, b, normal, depth):
+    """Separate two overlapping cars and exchange an equal-mass impulse along normal"""
+    nx, ny = normal
+    for body, sign in ((a, -1), (b, 1)):
+        body.car.x += sign * nx * depth / 2
+        body.car.y += sign * ny * depth / 2
+        body.x += sign * nx * depth / 2
+        body.y += sign * ny * depth / 2
+
+    velocity_a = (a.forward[0] * a.car.vel, a.forward[1] * a.car.vel)
+    velocity_b = (b.forward[0] * b.car.vel, b.forward[1] * b.car.vel)
+    closing = (velocity_b[0] - velocity_a[0]) * nx + (velocity_b[1] - velocity_a[1]) * ny
+    if closing >= 0:
+        return
+
+    impulse = -(1 + RESTITUTION) * closing / 2
+    velocity_a = (velocity_a[0] - impulse * nx, velocity_a[1] - impulse * ny)
+    velocity_b = (velocity_b[0] + impulse * nx, velocity_b[1] + impulse * ny)
+    # Only the part along each car's heading can be kept
+    a.car.vel = velocity_a[0] * a.forward[0] + velocity_a[1] * a.forward[1]
+    b.car.vel = velocity_b[0] * b.forward[0] + velocity_b[1] * b.forward[1]
+
+
+def collide_cars(cars, spatial_hash=None):
+    """Find and resolve every overlapping pair of cars.
+
+    Returns the contact points, one (x, y) per resolved pair.
+    """
+    if spatial_hash is None:
+        spatial_hash = SpatialHash()
+    boxes = []
+    for car in cars:
+        x, y = car.rect_center()
+        radius = math.hypot(*get_half_extents(car.img))
+        boxes.append((x - radius, y - radius, x + radius, y + radius))
+    spatial_hash.rebuild(boxes)
+
+    # Oriented rects are only worked out for cars that have a neighbour
+    bodies = {}
+    contacts = []
+    for i, j in sorted(spatial_hash.pairs()):
+        a = bodies.get(i) or bodies.setdefault(i, Body(cars[i]))
+        b = bodies.get(j) or bodies.setdefault(j, Body(cars[j]))
+        hit = overlap(a, b)
+        if hit is not None:
+            resolve(a, b, *hit)
+            contacts.append(((a.x + b.x) / 2, (a.y + b.y) / 2))
+    return contacts
@@ -0,0 +1,154 @@
+"""Frame profiler: named timing scopes, rolling percentiles and an overlay.
+
+    with profiler.scope("particles"):
+        particle_system.update()
+
+Time spent in each named scope is summed per frame between begin_frame()
+and end_frame(), and the last window frames are kept for percentiles and
+export. While disabled, scope() hands back one shared do-nothing context
+manager, so instrumented code pays a method call and nothing else.
+"""
+import csv
+import time
+from collections import deque
+import pygame
+
+
+class _NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    """Adds the time between enter and exit to its stage. Not re-entrant"""
+    __slots__ = ("samples", "name", "start")
+
+    def __init__(self, samples, name):
+        self.samples = samples
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        samples = self.samples
+        samples[self.name] = samples.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Profiler:
+    """Per-stage frame timings over the last window frames.
+
+    Stages keep the order they were first seen in. show_overlay only
+    controls drawing; enabling the overlay through toggle() also enables
+    collection.
+    """
+
+    # Refresh the overlay text this often (in frames) rather than every frame
+    OVERLAY_INTERVAL = 30
+
+    def __init__(self, window=600, enabled=False):
+        self.enabled = enabled
+        self.show_overlay = False
+        self.frames = deque(maxlen=window)
+        self.stages = []
+        self.current = {}
+        self.scopes = {}
+        self.frame_start = None
+        self.overlay = None
+        self.overlay_age = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _Scope(self.current, name)
+            self.stages.append(name)
+        return scope
+
+    def toggle(self):
+        """Switch the overlay, and with it profiling, on or off"""
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.show_overlay
+        self.overlay = None
+        self.frame_start = None
+
+    def begin_frame(self):
+        if self.enabled:
+            self.current.clear()
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        sample = dict(self.current)
+        sample["frame"] = time.perf_counter() - self.frame_start
+        self.frames.append(sample)
+        self.frame_start = None
+
+    def percentiles(self, name, fractions=(0.5, 0.95, 0.99)):
+        """Percentiles in seconds of name ("frame" for whole frames) over the window.
+        Frames where the stage did not run count as zero"""
+        if not self.frames:
+            return tuple(0.0 for _ in fractions)
+        ordered = sorted(sample.get(name, 0.0) for sample in self.frames)
+        return tuple(percentile(ordered, fraction) for fraction in fractions)
+
+    def report(self):
+        """{stage: (p50, p95, p99)} for every stage plus the whole frame"""
+        return {name: self.percentiles(name) for name in ["frame"] + self.stages}
+
+    def export(self, path):
+        """Write the frames in the window to a CSV file, one row per frame, in milliseconds"""
+        columns = ["frame"] + self.stages
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for sample in self.frames:
+                writer.writerow([f"{sample.get(name, 0.0) * 1000:.4f}" for name in columns])
+        return len(self.frames)
+
+    def draw(self, win, font, pos=(10, 10)):
+        """Draw the percentile table (milliseconds), returning the rect drawn to (None when hidden)"""
+        if not self.show_overlay:
+            return None
+        if self.overlay is None or self.overlay_age >= self.OVERLAY_INTERVAL:
+            self.overlay = self.render_overlay(font)
+            self.overlay_age = 0
+        self.overlay_age += 1
+        return win.blit(self.overlay, pos)
+
+    def render_overlay(self, font):
+        # Rendered straight from the font: these strings change too often for the shared text cache
+        rows = [["stage", "p50", "p95", "p99"]]
+        for name, values in self.report().items():
+            rows.append([name] + [f"{value * 1000:.2f}" for value in values])
+        rendered = [[font.render(text, True, (255, 255, 255)) for text in row] for row in rows]
+
+        # Columns are laid out by measured width, so any font lines up
+        widths = [max(row[i].get_width() for row in rendered) + 12 for i in range(len(rows[0]))]
+        line_height = font.get_linesize()
+        overlay = pygame.Surface((sum(widths) + 10, line_height * len(rows) + 10), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 170))
+        for i, row in enumerate(rendered):
+            right = 5
+            for column, (surface, width) in enumerate(zip(row, widths)):
+                right += width
+                # Stage names align left, timings (in ms) align right
+                x = right - width if column == 0 else right - surface.get_width() - 12
+                overlay.blit(surface, (x, 5 + i * line_height))
+        return overlay
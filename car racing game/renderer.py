@@ -0,0 +1,34 @@
+import pygame
+
+
+class DirtyRectRenderer:
+    """Presents only the parts of the window that changed since the last frame.
+
+    Each frame starts by restoring last frame's dirty regions from the cached
+    background. Everything drawn afterwards reports its rect, and present()
+    updates the display with both the old and the new regions.
+    """
+
+    def __init__(self, background):
+        self.background = background
+        self.previous = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Repaint and present the whole window next frame, e.g. after an overlay"""
+        self.full_redraw = True
+
+    def begin(self, win):
+        if self.full_redraw:
+            win.blit(self.background, (0, 0))
+        else:
+            win.blits([(self.background, rect, rect) for rect in self.previous], doreturn=False)
+
+    def present(self, rects):
+        rects = [rect for rect in rects if rect]
+        if self.full_redraw:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + rects)
+        self.previous = rects
@@ -0,0 +1,212 @@
+"""Record and play back races from the player's inputs alone.
+
+The simulation is deterministic given the per-step controls, so a replay is
+a small header plus the controls of every step packed into 4 bits, two
+steps to a byte, then zlib-compressed. Held keys compress to a few bytes per
+second of racing.
+
+    python replay.py replays/race.rcr            # verify the outcome offline
+    python replay.py replays/race.rcr --seek 600 # state at step 600
+"""
+import argparse
+import os
+import random
+import struct
+import time
+import zlib
+from array import array
+from functools import lru_cache
+import numpy as np
+from core import Race, PlayerCar, Controls, CAR_NAMES, IMG_DIR, PATH, SIM_RATE, load_assets
+
+# magic, version, seed, start level, car index, track id, simulation rate, steps
+HEADER = struct.Struct("<4sHIHBIHI")
+MAGIC = b"RCRP"
+VERSION = 1
+
+PLAYER_MAX_VEL = 4.5
+PLAYER_ROTATION_VEL = 4.5
+
+
+def subsystem_rngs(seed):
+    """Independent random streams for each randomized subsystem, all derived from seed"""
+    particles, background = np.random.SeedSequence(seed).spawn(2)
+    return {
+        "particles": np.random.default_rng(particles),
+        "background": random.Random(int(background.generate_state(1)[0])),
+    }
+
+
+@lru_cache(maxsize=None)
+def track_id():
+    """Checksum of everything that shapes the race: the border image and the AI path"""
+    with open(os.path.join(IMG_DIR, "track-border.png"), "rb") as f:
+        return zlib.crc32(repr(PATH).encode(), zlib.crc32(f.read()))
+
+
+def pack_controls(controls):
+    return controls.left | controls.right << 1 | controls.forward << 2 | controls.backward << 3
+
+
+def unpack_controls(bits):
+    return Controls(bool(bits & 1), bool(bits & 2), bool(bits & 4), bool(bits & 8))
+
+
+class Replay:
+    """A race's seed and settings plus the player's controls for every step"""
+
+    def __init__(self, seed, level=1, car="Red", track=None, sim_rate=SIM_RATE, log=None, steps=0):
+        self.seed = seed
+        self.level = level
+        self.car = car
+        self.track = track_id() if track is None else track
+        self.sim_rate = sim_rate
+        self.log = log if log is not None else array("B")
+        self.steps = steps
+
+    def __len__(self):
+        return self.steps
+
+    def record(self, controls):
+        bits = pack_controls(controls)
+        if self.steps % 2 == 0:
+            self.log.append(bits)
+        else:
+            self.log[-1] |= bits << 4
+        self.steps += 1
+
+    def controls(self, step):
+        return unpack_controls(self.log[step // 2] >> (step % 2 * 4))
+
+    def __iter__(self):
+        for step in range(self.steps):
+            yield self.controls(step)
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.level, CAR_NAMES.index(self.car),
+                             self.track, self.sim_rate, self.steps)
+        return header + zlib.compress(self.log.tobytes(), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, level, car, track, sim_rate, steps = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a replay file, or from an incompatible version")
+        log = array("B", zlib.decompress(data[HEADER.size:]))
+        return cls(seed, level, CAR_NAMES[car], track, sim_rate, log, steps)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayPlayer:
+    """Re-runs a replay on a fresh Race.
+
+    step() advances one step, fast_forward() runs without rendering or
+    waits, run_realtime() paces steps at the recorded rate, and seek() jumps
+    to any step (backwards by re-simulating from the start). events lists
+    (step, "lost" | "level complete" | "won", level, level time) as they
+    happen.
+    """
+
+    def __init__(self, replay, race_factory=None):
+        if replay.track != track_id():
+            raise ValueError("replay was recorded on a different track")
+        if replay.sim_rate != SIM_RATE:
+            raise ValueError(f"replay was recorded at {replay.sim_rate} steps/s, not {SIM_RATE}")
+        self.replay = replay
+        self.race_factory = race_factory or self.default_race
+        self.restart()
+
+    def default_race(self):
+        return Race(PlayerCar(PLAYER_MAX_VEL, PLAYER_ROTATION_VEL, load_assets().cars[self.replay.car]))
+
+    def restart(self):
+        self.race = self.race_factory()
+        self.events = []
+        self.position = 0
+        race = self.race
+        race.on_lose = lambda game_info: self.log_event("lost", game_info)
+        race.on_level_complete = lambda game_info: self.log_event("level complete", game_info)
+        race.on_win = lambda game_info: self.log_event("won", game_info)
+        race.game_info.level = self.replay.level
+        race.computer_car.next_level(self.replay.level)
+
+    def log_event(self, outcome, game_info):
+        self.events.append((self.position, outcome, game_info.level, game_info.get_level_time()))
+
+    def finished(self):
+        return self.position >= len(self.replay)
+
+    def step(self):
+        """Advance one step. Returns False once the replay has run out"""
+        if self.finished():
+            return False
+        # Levels were started by a key press, which takes no simulation steps
+        if not self.race.game_info.started:
+            self.race.game_info.start_level()
+        self.race.step(self.replay.controls(self.position))
+        self.position += 1
+        return True
+
+    def fast_forward(self, steps=None):
+        """Run steps (default: the rest of the replay) as fast as possible"""
+        end = len(self.replay) if steps is None else min(self.position + steps, len(self.replay))
+        while self.position < end:
+            self.step()
+
+    def seek(self, step):
+        if step < self.position:
+            self.restart()
+        self.fast_forward(step - self.position)
+
+    def run_realtime(self, on_step=None, speed=1.0):
+        """Play at the recorded rate (times speed), calling on_step(race) after every step"""
+        step_time = 1 / (self.replay.sim_rate * speed)
+        next_time = time.perf_counter()
+        while self.step():
+            if on_step:
+                on_step(self.race)
+            next_time += step_time
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    parser = argparse.ArgumentParser(description="Re-simulate a replay and report what happened")
+    parser.add_argument("replay")
+    parser.add_argument("--seek", type=int, help="stop at this step and print the car states")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    size = os.path.getsize(args.replay)
+    seconds = len(replay) / replay.sim_rate
+    print(f"{args.replay}: {replay.car} car, seed {replay.seed}, level {replay.level}, "
+          f"{len(replay)} steps ({seconds:.1f}s), {size} bytes ({size / max(seconds, 1e-9):.1f} B/s)")
+
+    player = ReplayPlayer(replay)
+    start = time.perf_counter()
+    if args.seek is not None:
+        player.seek(args.seek)
+    else:
+        player.fast_forward()
+    elapsed = time.perf_counter() - start
+
+    for step, outcome, level, level_time in player.events:
+        print(f"step {step:6}  {outcome:15} level {level:2}  {level_time}s")
+    for car in player.race.cars:
+        print(f"{type(car).__name__:12} x {car.x:8.2f}  y {car.y:8.2f}  angle {car.angle:8.2f}  vel {car.vel:5.2f}")
+    print(f"simulated {player.position} steps in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""The game's screens as a state machine driven by one loop.
+
+A Scene gets enter(**kwargs) when it becomes current, then on every pass
+handle(event) for each event, update(now) and draw(win). Busy scenes are
+ticked at their fps. Idle scenes (static screens) instead block in
+pygame.event.wait until an event arrives or their deadline passes, so a
+screen waiting for a key or a timer costs no CPU.
+
+Scenes change with switch() at once, or through a queue: push() lines a
+scene up from anywhere (e.g. a race callback mid-step) and advance() moves
+to the next queued one, falling back to a default. A scene just switched to
+is always drawn once before it first waits for events.
+"""
+import math
+import time
+from collections import deque
+import pygame
+
+
+class Scene:
+    fps = 60
+    # Block on events between deadlines instead of ticking at fps
+    idle = False
+    # Overlays kept per scene; cleared whole when it grows past this
+    MAX_CACHED = 32
+
+    def __init__(self):
+        self.runner = None
+        # perf_counter time at which the scene next needs an update, for idle scenes
+        self.deadline = None
+        self.overlays = {}
+
+    def enter(self, **kwargs):
+        pass
+
+    def handle(self, event):
+        pass
+
+    def update(self, now):
+        pass
+
+    def draw(self, win):
+        pass
+
+    def cached(self, key, build):
+        """The overlay for key, built with build() the first time it is needed"""
+        overlay = self.overlays.get(key)
+        if overlay is None:
+            if len(self.overlays) >= self.MAX_CACHED:
+                self.overlays.clear()
+            overlay = self.overlays[key] = build()
+        return overlay
+
+
+class SceneRunner:
+    def __init__(self, win, scenes):
+        self.win = win
+        self.scenes = scenes
+        for scene in scenes.values():
+            scene.runner = self
+        self.scene = None
+        self.name = None
+        self.pending = deque()
+        # Set by switch() until the new scene has had a pass without waiting
+        self.entered = False
+        self.running = False
+        self.clock = pygame.time.Clock()
+
+    def switch(self, name, **kwargs):
+        self.name = name
+        self.scene = self.scenes[name]
+        self.entered = True
+        self.scene.enter(**kwargs)
+
+    def push(self, name, **kwargs):
+        self.pending.append((name, kwargs))
+
+    def advance(self, default=None, **kwargs):
+        """Switch to the next queued scene, or to default if none is queued"""
+        if self.pending:
+            name, kwargs = self.pending.popleft()
+        elif default is None:
+            return
+        else:
+            name = default
+        self.switch(name, **kwargs)
+
+    def stop(self):
+        self.running = False
+
+    def events(self, scene):
+        entered, self.entered = self.entered, False
+        if not scene.idle:
+            self.clock.tick(scene.fps)
+            return pygame.event.get()
+        # A new scene draws before it blocks; it may have nothing to wait for until a key press
+        if entered:
+            return pygame.event.get()
+
+        if scene.deadline is None:
+            event = pygame.event.wait()
+        else:
+            timeout = scene.deadline - time.perf_counter()
+            if timeout <= 0:
+                return pygame.event.get()
+            event = pygame.event.wait(math.ceil(timeout * 1000))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def run(self, name, **kwargs):
+        """Run from scene name until stop() or the window is closed"""
+        self.running = True
+        self.switch(name, **kwargs)
+        while self.running:
+            scene = self.scene
+            for event in self.events(scene):
+                if event.type == pygame.QUIT:
+                    self.stop()
+                    return
+                scene.handle(event)
+                # The rest of these events were meant for the scene that left; they are dropped
+                if self.scene is not scene:
+                    break
+
+            if self.scene is scene:
+                scene.update(time.perf_counter())
+            if self.scene is scene and self.running:
+                scene.draw(self.win)
@@ -0,0 +1,103 @@
+"""Ray-cast distance sensors against the track border.
+
+Each car casts rays at fixed angles relative to its heading. One call traces
+every ray of every car together as NumPy arrays, sphere tracing the border's
+distance field: each step along a ray is as long as the field says is clear,
+so open stretches take a few lookups. Rays still going after a few steps
+(those grazing a wall, where the steps shrink) are finished by looking up
+every pixel along them, a stretch at a time.
+"""
+from functools import lru_cache
+import numpy as np
+from core import load_assets
+from track import get_distance_field
+
+# Degrees from the heading, 0 straight ahead and positive to the car's left
+DEFAULT_ANGLES = (-90, -60, -30, -15, 0, 15, 30, 60, 90)
+MAX_RANGE = 250
+
+# How far one lookup of the sensors' field can vouch for, in pixels
+FIELD_DISTANCE = 64
+# Sphere tracing steps before the remaining rays are finished pixel by pixel,
+# TAIL_PIXELS at a time
+TRACE_STEPS = 12
+TAIL_PIXELS = 32
+# Shortest step, so rays running alongside a wall still get somewhere
+MIN_STEP = 1.0
+
+
+@lru_cache(maxsize=None)
+def _padded_lookup(field, pad):
+    """field flattened inside pad pixels of free space, so a lookup anywhere
+    within pad of the field needs no bounds checks. Shared by every sensor on
+    the same field and range"""
+    padded = np.pad(field.field.astype(np.float32), pad, constant_values=field.max_distance)
+    return padded.ravel(), padded.shape[1]
+
+
+class RaySensor:
+    """Rays at angles (degrees) from each car's heading, reaching up to max_range pixels"""
+
+    def __init__(self, angles=DEFAULT_ANGLES, max_range=MAX_RANGE, field=None):
+        if field is None:
+            field = get_distance_field(load_assets().track_border_mask, FIELD_DISTANCE)
+        self.angles = np.radians(np.asarray(angles, dtype=np.float32))
+        self.max_range = np.float32(max_range)
+        self.width, self.height = field.width, field.height
+        self.pad = int(max_range) + 2
+        self.lookup, self.stride = _padded_lookup(field, self.pad)
+        # Distances along a ray for the pixel by pixel finish
+        self.offsets = np.arange(1, TAIL_PIXELS + 1, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.angles)
+
+    def clearance(self, x, y):
+        """Field values at padded (x, y), which must lie within the padding"""
+        return self.lookup.take(x.astype(np.intp) * self.stride + y.astype(np.intp))
+
+    def cast(self, x, y, heading):
+        """Distance to the border along every ray.
+
+        x, y and heading (degrees, like car.angle) are equal-length arrays,
+        one entry per car. Returns an (n cars, n rays) float32 array, holding
+        max_range for rays that hit nothing and 0 for rays from inside it.
+        """
+        heading = np.radians(np.asarray(heading, dtype=np.float32))[:, None] + self.angles
+        # Cars drive along (-sin, -cos) of their angle
+        dx, dy = -np.sin(heading), -np.cos(heading)
+        # Origins are kept on the field, which keeps every lookup on the padded one
+        x = np.clip(np.asarray(x, dtype=np.float32), 0, self.width - 1)[:, None] + self.pad
+        y = np.clip(np.asarray(y, dtype=np.float32), 0, self.height - 1)[:, None] + self.pad
+
+        t = np.zeros(heading.shape, dtype=np.float32)
+        for _ in range(TRACE_STEPS):
+            clearance = self.clearance(x + dx * t, y + dy * t)
+            moving = (clearance > 0) & (t < self.max_range)
+            if not moving.any():
+                return t
+            t += np.maximum(clearance, MIN_STEP) * moving
+            np.minimum(t, self.max_range, out=t)
+
+        clearance = self.clearance(x + dx * t, y + dy * t)
+        car, ray = np.nonzero((clearance > 0) & (t < self.max_range))
+        while len(car):
+            # A row of samples a pixel apart from where each ray got to; the first blocked one is the hit
+            along = np.minimum(t[car, ray, None] + self.offsets, self.max_range)
+            blocked = self.clearance(x[car] + dx[car, ray, None] * along,
+                                     y[car] + dy[car, ray, None] * along) <= 0
+            rows, first = np.arange(len(car)), blocked.argmax(axis=1)
+            hit = blocked[rows, first]
+            t[car, ray] = np.where(hit, along[rows, first], along[:, -1])
+            going = ~hit & (along[:, -1] < self.max_range)
+            car, ray = car[going], ray[going]
+        return t
+
+    def cast_cars(self, cars):
+        """cast for AbstractCar instances, from the middle of each car"""
+        centres = [car.rect_center() for car in cars]
+        return self.cast([x for x, _ in centres], [y for _, y in centres], [car.angle for car in cars])
+
+    def cast_fleet(self, fleet):
+        """cast for every car of an AIFleet"""
+        return self.cast(fleet.x + fleet.width / 2, fleet.y + fleet.height / 2, fleet.angle)
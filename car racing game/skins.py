@@ -0,0 +1,113 @@
+"""Car liveries generated from one base sprite.
+
+Every car is the same sprite in a different paint, so only the base sprite
+is loaded and each livery is made from it by a palette remap: pixels of the
+base paint's hue are recoloured to the livery colour, keeping their shading,
+while windows, lights and tyres are left as they are.
+
+Liveries share the base sprite's collision mask and geometry (see
+utils.share_shape), so a new livery costs only its own pixels and rotations.
+"""
+from collections import OrderedDict
+import numpy as np
+import pygame
+from utils import to_display_format, scale_image, share_shape
+
+BASE_SPRITE = "red-car.png"
+BASE_PAINT = (244, 67, 54)
+
+# Paint colour of each named livery, taken from the original per-colour sprites
+LIVERIES = {
+    "Red": BASE_PAINT,
+    "Green": (76, 175, 80),
+    "Grey": (84, 110, 122),
+    "Purple": (103, 58, 183),
+    "White": (236, 239, 241),
+}
+
+# Pixels within HUE_TOLERANCE degrees of the base paint's hue, and at least
+# MIN_SATURATION saturated, are paint
+HUE_TOLERANCE = 20
+MIN_SATURATION = 0.4
+
+# Other colours and scaled variants kept at once
+SKIN_CACHE_SIZE = 32
+
+
+def hue_saturation(rgb):
+    """Hue (degrees) and saturation of an (..., 3) array of 0-255 colours"""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    high, low = rgb.max(axis=-1), rgb.min(axis=-1)
+    chroma = high - low
+    safe = np.where(chroma == 0, 1, chroma)
+    hue = np.where(high == r, (g - b) / safe % 6,
+                   np.where(high == g, (b - r) / safe + 2, (r - g) / safe + 4)) * 60
+    saturation = np.where(high == 0, 0, chroma / np.where(high == 0, 1, high))
+    return np.where(chroma == 0, 0, hue), saturation
+
+
+def paint(base, color, base_paint=BASE_PAINT):
+    """Copy of base with its paint recoloured to color"""
+    if tuple(color) == tuple(base_paint):
+        return base
+    skin = base.copy()
+    pixels = pygame.surfarray.pixels3d(skin)
+    hue, saturation = hue_saturation(pixels)
+    base_hue, _ = hue_saturation(base_paint)
+    distance = np.abs((hue - base_hue + 180) % 360 - 180)
+    is_paint = (distance <= HUE_TOLERANCE) & (saturation >= MIN_SATURATION)
+
+    # Each paint pixel keeps its brightness relative to the base paint
+    shade = pixels[is_paint].max(axis=1) / max(base_paint)
+    pixels[is_paint] = np.clip(np.outer(shade, color), 0, 255).astype(np.uint8)
+    del pixels
+    share_shape(skin, base)
+    return skin
+
+
+class SkinCache:
+    """Liveries of one base sprite.
+
+    The named liveries are made up front and kept. Any other colour, and any
+    scaled variant, is made on first use and kept in an LRU of size entries.
+    Every skin shares the base's masks for as long as it is in use, and the
+    rotation cache is bounded, so memory stays flat however many liveries
+    come and go.
+    """
+
+    def __init__(self, base, liveries=LIVERIES, size=SKIN_CACHE_SIZE):
+        self.base = base
+        self.colors = dict(liveries)
+        self.liveries = {name: paint(base, color) for name, color in liveries.items()}
+        self.size = size
+        self.cache = OrderedDict()
+
+    def __getitem__(self, name):
+        return self.liveries[name]
+
+    def get(self, livery, factor=1):
+        """A livery by name or (r, g, b) colour, scaled by factor"""
+        source = livery
+        if isinstance(livery, str):
+            if factor == 1:
+                return self.liveries[livery]
+            livery = self.colors[livery]
+        key = (tuple(livery), factor)
+        skin = self.cache.get(key)
+        if skin is not None:
+            self.cache.move_to_end(key)
+            return skin
+
+        if factor == 1:
+            skin = paint(self.base, key[0])
+        else:
+            skin = scale_image(self.get(source), factor)
+        self.cache[key] = skin
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return skin
+
+    def converted(self):
+        """The same liveries made from the base in the display pixel format. Needs an open display"""
+        return SkinCache(to_display_format(self.base), self.colors, self.size)
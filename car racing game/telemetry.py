@@ -0,0 +1,135 @@
+"""Per-step race telemetry, written to disk without stalling the game loop.
+
+Each simulation step becomes one fixed-layout row in a preallocated ring
+buffer. A background thread drains the ring in batches and appends each
+batch to the file as a block of columns. read_telemetry loads a file back
+as one NumPy array per column.
+
+File layout: MAGIC, a uint32 length and a JSON list of [name, dtype] pairs,
+then blocks of a uint32 row count followed by each column's raw values.
+"""
+import json
+import struct
+import threading
+import numpy as np
+
+MAGIC = b"RCTL"
+COUNT = struct.Struct("<I")
+
+ROW = np.dtype([
+    ("step", "<u4"),
+    ("level", "<u2"),
+    ("level_time", "<f4"),
+    ("player_x", "<f4"),
+    ("player_y", "<f4"),
+    ("player_angle", "<f4"),
+    ("player_vel", "<f4"),
+    ("computer_x", "<f4"),
+    ("computer_y", "<f4"),
+    ("computer_angle", "<f4"),
+    ("computer_vel", "<f4"),
+    ("computer_point", "<i4"),
+    ("collisions", "u1"),
+])
+
+# Bits of the collisions column
+WALL = 1
+CAR = 2
+
+
+class TelemetryRecorder:
+    """Ring buffer of ROW records with a writer thread behind it.
+
+    record() only fills the next slot and, once batch rows are waiting,
+    wakes the writer. If the writer falls a whole ring behind, new rows are
+    dropped and counted in dropped rather than blocking the caller.
+    """
+
+    def __init__(self, path, capacity=8192, batch=1024):
+        self.ring = np.zeros(capacity, dtype=ROW)
+        self.capacity = capacity
+        self.batch = batch
+        # Rows produced and rows written so far; slot = count % capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+        self.file = open(path, "wb")
+        columns = json.dumps([[name, ROW.fields[name][0].str] for name in ROW.names]).encode()
+        self.file.write(MAGIC + COUNT.pack(len(columns)) + columns)
+
+        self.wake = threading.Event()
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name="telemetry-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, race, collisions=0):
+        """Add a row describing race after its latest step"""
+        if self.head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+
+        game_info = race.game_info
+        player, computer = race.player_car, race.computer_car
+        level_time = game_info.clock() - game_info.level_start_time if game_info.started else 0
+        point = computer.line_index if computer.racing_line is not None else computer.current_point
+        self.ring[self.head % self.capacity] = (
+            race.steps, game_info.level, level_time,
+            player.x, player.y, player.angle, player.vel,
+            computer.x, computer.y, computer.angle, computer.vel, point,
+            collisions)
+        self.head += 1
+
+        if self.head - self.tail >= self.batch:
+            self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            closing = self.closing
+            self.flush()
+            if closing:
+                break
+
+    def flush(self):
+        """Write every waiting row. Runs on the writer thread"""
+        head = self.head
+        while self.tail < head:
+            start = self.tail % self.capacity
+            end = min(start + head - self.tail, self.capacity)
+            block = self.ring[start:end]
+            self.file.write(COUNT.pack(len(block)))
+            for name in ROW.names:
+                self.file.write(np.ascontiguousarray(block[name]).tobytes())
+            # Only now may record() reuse these slots
+            self.tail += len(block)
+        self.file.flush()
+
+    def close(self):
+        """Write the remaining rows and stop the writer"""
+        self.closing = True
+        self.wake.set()
+        self.thread.join()
+        self.file.close()
+
+
+def read_telemetry(path):
+    """Load a telemetry file as {column name: array}"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError("not a telemetry file")
+    (length,) = COUNT.unpack_from(data, 4)
+    offset = 8 + length
+    columns = [(name, np.dtype(dtype)) for name, dtype in json.loads(data[8:offset])]
+
+    blocks = {name: [] for name, _ in columns}
+    while offset + COUNT.size <= len(data):
+        (rows,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for name, dtype in columns:
+            blocks[name].append(np.frombuffer(data, dtype, rows, offset))
+            offset += rows * dtype.itemsize
+    return {name: np.concatenate(parts) if parts else np.empty(0, dtype)
+            for (name, dtype), parts in zip(columns, blocks.values())}
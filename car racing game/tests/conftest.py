@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The game's modules import each other flat, from the game directory
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
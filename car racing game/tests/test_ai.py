@@ -0,0 +1,17 @@
+import pytest
+from ai import AIFleet
+from core import ComputerCar, PATH
+from track import get_racing_line
+
+
+@pytest.mark.parametrize("racing_line", [get_racing_line(PATH), None])
+def test_fleet_car_drives_like_computer_car_from_standstill(racing_line):
+    fleet = AIFleet(1, racing_line=racing_line)
+    car = ComputerCar(3, 3, PATH, racing_line=racing_line)
+    fleet.reset()
+    car.reset()
+    for _ in range(600):
+        fleet.move()
+        car.move()
+        assert fleet.vel[0] == pytest.approx(car.vel)
+        assert (fleet.x[0], fleet.y[0]) == pytest.approx((car.x, car.y))
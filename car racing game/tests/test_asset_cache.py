@@ -0,0 +1,23 @@
+import os
+import pygame
+import pytest
+import asset_cache
+from core import IMG_DIR, TRACK_SCALE, GRASS_SCALE
+
+
+@pytest.mark.parametrize("name, factor", [("track-border.png", TRACK_SCALE), ("grass.jpg", GRASS_SCALE)])
+def test_warm_cache_matches_cold_load(tmp_path, monkeypatch, name, factor):
+    monkeypatch.setattr(asset_cache, "CACHE_DIR", str(tmp_path))
+    path = os.path.join(IMG_DIR, name)
+
+    cold_img = asset_cache.load_image(path, factor)
+    cold_mask = asset_cache.load_mask(path, factor, cold_img)
+    assert sorted(entry.rsplit(".", 1)[1] for entry in os.listdir(tmp_path)) == ["img", "mask"]
+
+    warm_img = asset_cache.load_image(path, factor)
+    warm_mask = asset_cache.load_mask(path, factor)
+    assert warm_img.get_size() == cold_img.get_size()
+    assert pygame.image.tobytes(warm_img, "RGBA") == pygame.image.tobytes(cold_img, "RGBA")
+    assert warm_mask.get_size() == cold_mask.get_size()
+    assert warm_mask.count() == cold_mask.count()
+    assert warm_mask.overlap_area(cold_mask, (0, 0)) == cold_mask.count()
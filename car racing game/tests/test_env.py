@@ -0,0 +1,20 @@
+import pytest
+from core import PlayerCar
+from env import RacingEnv
+
+
+def test_terminal_observation_is_from_before_the_reset():
+    env = RacingEnv()
+    env.reset()
+    grid = (PlayerCar.START_POS[0] / env.width, PlayerCar.START_POS[1] / env.height)
+    # The player stays on the grid while the computer car laps it
+    for _ in range(env.max_steps):
+        obs, reward, terminated, truncated, info = env.step(0)
+        if terminated:
+            break
+    assert info == {"outcome": "lost"}
+    computer = (obs[6], obs[7])
+    assert computer != (env.race.computer_car.x / env.width, env.race.computer_car.y / env.height)
+    # Nearly a lap behind the computer, which is on the finish line
+    assert obs[8] < -0.9
+    assert tuple(obs[:2]) == pytest.approx(grid)
@@ -0,0 +1,67 @@
+import random
+from core import Race, PlayerCar, Controls, load_assets
+from particles import ParticleSystem
+from replay import Replay, ReplayPlayer, subsystem_rngs, PLAYER_MAX_VEL, PLAYER_ROTATION_VEL
+
+STEPS = 3000
+SEEK_BACK = 1234
+
+
+def seeded_race(replay):
+    """A race like the game's, with its particles drawn from the replay's seed"""
+    return Race(PlayerCar(PLAYER_MAX_VEL, PLAYER_ROTATION_VEL, load_assets().cars[replay.car]),
+                particle_system=ParticleSystem(rng=subsystem_rngs(replay.seed)["particles"]))
+
+
+def pose(race):
+    cars = tuple((car.x, car.y, car.angle, car.vel) for car in race.cars)
+    particles = race.particle_system
+    return cars, particles.count, particles.pos[:particles.count].tobytes()
+
+
+def record(replay, steps):
+    """Drive a race with random held keys, recording them into replay.
+    Returns the pose after every step and the events, as ReplayPlayer logs them"""
+    race = seeded_race(replay)
+    race.game_info.level = replay.level
+    race.computer_car.next_level(replay.level)
+    events, poses = [], []
+    for outcome, callback in (("lost", "on_lose"), ("level complete", "on_level_complete"), ("won", "on_win")):
+        setattr(race, callback, lambda game_info, outcome=outcome: events.append(
+            (len(poses), outcome, game_info.level, game_info.get_level_time())))
+
+    keys = random.Random(replay.seed)
+    controls = Controls(False, False, True, False)
+    for step in range(steps):
+        # Keys are held for a while, mostly with the throttle down, as a player would
+        if step % 15 == 0:
+            controls = Controls(keys.random() < 0.3, keys.random() < 0.3,
+                                keys.random() < 0.8, keys.random() < 0.1)
+        if not race.game_info.started:
+            race.game_info.start_level()
+        replay.record(controls)
+        race.step(controls)
+        poses.append(pose(race))
+    return poses, events
+
+
+def test_playback_matches_the_recorded_race():
+    replay = Replay(seed=20240611)
+    poses, events = record(replay, STEPS)
+    assert events, "the recorded race should reach the end of a level"
+
+    replay = Replay.from_bytes(replay.to_bytes())
+    assert len(replay) == STEPS
+    player = ReplayPlayer(replay, race_factory=lambda: seeded_race(replay))
+
+    player.fast_forward()
+    assert player.finished()
+    assert pose(player.race) == poses[-1]
+    assert player.events == events
+
+    # Backwards re-simulates from the start, forwards carries on from there
+    for step in (SEEK_BACK, SEEK_BACK + 500):
+        player.seek(step)
+        assert player.position == step
+        assert pose(player.race) == poses[step - 1]
+        assert player.events == [event for event in events if event[0] < step]
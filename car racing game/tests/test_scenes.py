@@ -0,0 +1,51 @@
+import time
+import pygame
+from scenes import Scene, SceneRunner
+
+
+class TimedScene(Scene):
+    """Idle scene that moves on to next_name after wait seconds, or stops the runner once drawn"""
+    idle = True
+
+    def __init__(self, name, next_name, wait, log):
+        super().__init__()
+        self.name = name
+        self.next_name = next_name
+        self.wait = wait
+        self.log = log
+
+    def enter(self):
+        self.drawn = False
+        self.deadline = time.perf_counter() + self.wait if self.next_name else None
+
+    def update(self, now):
+        if self.deadline is not None and now >= self.deadline:
+            self.runner.switch(self.next_name)
+
+    def draw(self, win):
+        # Idle scenes are drawn again on any wakeup; only the first draw counts
+        if not self.drawn:
+            self.log.append(self.name)
+        self.drawn = True
+        if self.next_name is None:
+            self.runner.stop()
+
+
+def test_every_scene_is_drawn_without_input():
+    pygame.display.init()
+    win = pygame.display.set_mode((16, 16))
+    pygame.event.clear()
+    log = []
+    runner = SceneRunner(win, {
+        "result": TimedScene("result", "countdown", 0.05, log),
+        "countdown": TimedScene("countdown", "start", 0.05, log),
+        # Has nothing to wait for; only drawing it ends the run
+        "start": TimedScene("start", None, 0, log),
+    })
+    # Ends the run instead of hanging if a scene blocks before drawing
+    pygame.time.set_timer(pygame.QUIT, 2000, loops=1)
+    try:
+        runner.run("result")
+    finally:
+        pygame.time.set_timer(pygame.QUIT, 0)
+    assert log == ["result", "countdown", "start"]
@@ -0,0 +1,38 @@
+import gc
+import pygame
+import utils
+from core import load_assets
+from skins import SkinCache
+from utils import get_rotated, get_rotated_mask, get_shape
+
+
+def test_mask_cache_stays_flat_past_the_skin_cache():
+    base = load_assets().skins.base
+    skins = SkinCache(base, size=8)
+    angles = range(0, 360, 30)
+    for angle in angles:
+        get_rotated_mask(base, angle)
+    masks = len(utils._MASK_CACHE)
+
+    # More colours than the LRU holds, every one still in use afterwards
+    in_use = [skins.get((10 * i, 255 - 5 * i, 100)) for i in range(20)]
+    for skin in in_use:
+        for angle in angles:
+            get_rotated(skin, angle)
+            get_rotated_mask(skin, angle)
+
+    assert len(utils._MASK_CACHE) == masks
+    assert all(get_shape(skin) is base for skin in in_use)
+
+
+def test_shapes_go_with_their_skins():
+    base = pygame.Surface((8, 16), pygame.SRCALPHA)
+    skins = SkinCache(base, liveries={}, size=1)
+    shapes = len(utils._SHAPES)
+    kept = skins.get((1, 2, 3))
+    skins.get((4, 5, 6))
+    skins.get((7, 8, 9))
+    gc.collect()
+    # The skin still in use and the one in the cache; the other went with its last reference
+    assert len(utils._SHAPES) == shapes + 2
+    assert get_shape(kept) is base
@@ -0,0 +1,49 @@
+import time
+import numpy as np
+from core import Race, FULL_THROTTLE
+from telemetry import ROW, TelemetryRecorder, read_telemetry
+
+STEPS = 1000
+
+
+def run(path, wait_for_writer):
+    """Race STEPS steps into a recorder with a small ring. Returns the recorder, closed"""
+    recorder = TelemetryRecorder(path, capacity=64, batch=16)
+    race = Race(telemetry=recorder)
+    race.game_info.start_level()
+    for _ in range(STEPS):
+        race.step(FULL_THROTTLE)
+        # Give the writer a chance to drain every batch, so that no row is dropped
+        while wait_for_writer and recorder.head - recorder.tail >= recorder.batch:
+            time.sleep(0.0005)
+    recorder.close()
+    return recorder
+
+
+def check_columns(columns):
+    assert list(columns) == list(ROW.names)
+    for name in ROW.names:
+        assert columns[name].dtype == ROW.fields[name][0]
+    assert len({len(column) for column in columns.values()}) == 1
+
+
+def test_every_row_is_read_back_in_order(tmp_path):
+    path = tmp_path / "race.rctl"
+    recorder = run(path, wait_for_writer=True)
+    columns = read_telemetry(path)
+    check_columns(columns)
+    assert recorder.dropped == 0
+    assert np.array_equal(columns["step"], np.arange(1, STEPS + 1))
+    assert (columns["level"] == 1).all()
+
+
+def test_rows_the_writer_cannot_keep_up_with_are_counted(tmp_path):
+    path = tmp_path / "race.rctl"
+    recorder = run(path, wait_for_writer=False)
+    columns = read_telemetry(path)
+    check_columns(columns)
+    steps = columns["step"]
+    assert recorder.dropped + len(steps) == STEPS
+    # Whatever was kept is still in order, without repeats
+    assert (np.diff(steps.astype(np.int64)) > 0).all()
+    assert steps.min() >= 1 and steps.max() <= STEPS
@@ -0,0 +1,26 @@
+import pygame
+from track import DistanceField
+
+
+def wall_field():
+    # A wall filling every row from y = 50 down
+    mask = pygame.mask.Mask((200, 100))
+    for x in range(200):
+        for y in range(50, 100):
+            mask.set_at((x, y))
+    return DistanceField(mask)
+
+
+def test_sweep_parallel_to_a_wall_is_clear():
+    field = wall_field()
+    radius = 5
+    # The circle's edge runs 1 px from the wall for the whole move
+    y = 50 - 0.5 - radius - 1
+    assert field.sweep(10, y, 190, y, radius) is None
+
+
+def test_sweep_into_a_wall_reports_contact():
+    field = wall_field()
+    t = field.sweep(100, 10, 100, 90, 5)
+    assert t is not None and 0 < t < 1
+    assert field.distance(100, 10 + 80 * t) - 5 <= 0
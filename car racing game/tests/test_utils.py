@@ -0,0 +1,14 @@
+import os
+from utils import prune_files
+
+
+def test_prune_files_keeps_the_newest(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"race-{i}.rcr"
+        path.write_bytes(b"")
+        os.utime(path, (i, i))
+    (tmp_path / "notes.txt").write_text("")
+
+    prune_files(tmp_path, ".rcr", 2)
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "race-3.rcr", "race-4.rcr"]
+    prune_files(tmp_path / "missing", ".rcr", 2)
@@ -0,0 +1,298 @@
+"""Precomputed track geometry derived from the hand-placed PATH and the border mask."""
+import math
+from functools import lru_cache
+import numpy as np
+import pygame
+
+
+def _catmull_rom(points, samples_per_segment, alpha=0.5):
+    """Sample a closed centripetal Catmull-Rom spline through points.
+
+    Returns samples_per_segment points per segment, starting at points[0].
+    """
+    p0 = np.roll(points, 1, axis=0)
+    p1 = points
+    p2 = np.roll(points, -1, axis=0)
+    p3 = np.roll(points, -2, axis=0)
+
+    # Knot spacing grows with the square root of the chord length (centripetal)
+    t0 = np.zeros(len(points))
+    t1 = t0 + np.linalg.norm(p1 - p0, axis=1) ** alpha
+    t2 = t1 + np.linalg.norm(p2 - p1, axis=1) ** alpha
+    t3 = t2 + np.linalg.norm(p3 - p2, axis=1) ** alpha
+
+    u = np.linspace(0, 1, samples_per_segment, endpoint=False)
+    t = (t1[:, None] + (t2 - t1)[:, None] * u)[:, :, None]
+    t0, t1, t2, t3 = (k[:, None, None] for k in (t0, t1, t2, t3))
+    p0, p1, p2, p3 = (p[:, None, :] for p in (p0, p1, p2, p3))
+
+    # Barry and Goldman's pyramidal formulation
+    a1 = (t1 - t) / (t1 - t0) * p0 + (t - t0) / (t1 - t0) * p1
+    a2 = (t2 - t) / (t2 - t1) * p1 + (t - t1) / (t2 - t1) * p2
+    a3 = (t3 - t) / (t3 - t2) * p2 + (t - t2) / (t3 - t2) * p3
+    b1 = (t2 - t) / (t2 - t0) * a1 + (t - t0) / (t2 - t0) * a2
+    b2 = (t3 - t) / (t3 - t1) * a2 + (t - t1) / (t3 - t1) * a3
+    c = (t2 - t) / (t2 - t1) * b1 + (t - t1) / (t2 - t1) * b2
+    return c.reshape(-1, 2)
+
+
+class RacingLine:
+    """A smooth closed racing line through a path, sampled every `step` pixels of arc length.
+
+    Sample i lies at distance i * step along the line from the first path
+    point, so looking up the point, tangent or curvature at any distance is
+    a single index computation. Samples are stored as arrays:
+
+    points      (n, 2) positions
+    tangent     (n, 2) unit direction of travel
+    curvature   (n,)   signed curvature in 1/pixels
+    """
+
+    def __init__(self, path, step=2.0, samples_per_segment=64):
+        dense = _catmull_rom(np.asarray(path, dtype=np.float64), samples_per_segment)
+        closed = np.vstack([dense, dense[:1]])
+        arc = np.concatenate([[0], np.cumsum(np.linalg.norm(np.diff(closed, axis=0), axis=1))])
+
+        self.length = float(arc[-1])
+        self.count = int(self.length // step)
+        self.step = self.length / self.count
+        s = np.arange(self.count) * self.step
+        self.points = np.column_stack([np.interp(s, arc, closed[:, 0]), np.interp(s, arc, closed[:, 1])])
+
+        # Derivatives by central differences around the closed loop
+        ahead = np.roll(self.points, -1, axis=0)
+        behind = np.roll(self.points, 1, axis=0)
+        d1 = (ahead - behind) / (2 * self.step)
+        d2 = (ahead - 2 * self.points + behind) / self.step ** 2
+        speed = np.linalg.norm(d1, axis=1)
+        self.tangent = d1 / speed[:, None]
+        self.curvature = (d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]) / speed ** 3
+        # Plain tuples for per-car lookups, where NumPy call overhead would dominate
+        self.point_list = list(map(tuple, self.points.tolist()))
+        self.tangent_list = list(map(tuple, self.tangent.tolist()))
+
+    def target_ahead(self, index, lookahead):
+        """Point `lookahead` pixels further along the line than sample index"""
+        return self.point_list[(index + int(lookahead // self.step)) % self.count]
+
+    def curvature_ahead(self, lookahead):
+        """Per sample, the sharpest |curvature| within the next lookahead pixels"""
+        window = max(1, int(lookahead // self.step))
+        ahead = (np.arange(self.count)[:, None] + np.arange(window + 1)) % self.count
+        return np.abs(self.curvature)[ahead].max(axis=1)
+
+    def corner_speeds(self, turn_rate, lookahead):
+        """Speed limit per sample for the tightest corner within lookahead pixels,
+        so a car slows before the corner rather than in it"""
+        with np.errstate(divide="ignore"):
+            return np.radians(turn_rate) / self.curvature_ahead(lookahead)
+
+    def nearest(self, x, y):
+        """Index of the sample closest to (x, y), searching the whole line"""
+        return int(np.argmin((self.points[:, 0] - x) ** 2 + (self.points[:, 1] - y) ** 2))
+
+    def advance_one(self, index, x, y):
+        """Move a car's sample index to follow it to (x, y).
+
+        Projects the offset from the current sample onto its tangent, which
+        is exact for the small distances a car covers in one step.
+        """
+        px, py = self.point_list[index]
+        tx, ty = self.tangent_list[index]
+        return (index + round(((x - px) * tx + (y - py) * ty) / self.step)) % self.count
+
+    def advance(self, index, x, y):
+        """Array version of advance_one, for many cars at once"""
+        offset = np.stack([x, y], axis=-1) - self.points[index]
+        along = (offset * self.tangent[index]).sum(axis=-1)
+        return (index + np.rint(along / self.step).astype(np.int64)) % self.count
+
+
+class ProgressField:
+    """Grid over the track mapping any position to its distance along a racing line.
+
+    Each cell of `cell` pixels stores the arc length of the nearest line
+    sample, measured from the sample closest to `start` (the finish line),
+    so a car's progress is one array lookup.
+    """
+
+    def __init__(self, line, size, start, cell=8):
+        self.line = line
+        self.cell = cell
+        self.columns = -(-size[0] // cell)
+        self.rows = -(-size[1] // cell)
+
+        start_index = line.nearest(*start)
+        arc = ((np.arange(line.count) - start_index) % line.count) * line.step
+
+        # Nearest sample to each cell centre, a band of rows at a time to bound memory
+        centres_x = (np.arange(self.columns) + 0.5) * cell
+        self.grid = np.empty((self.rows, self.columns), dtype=np.float32)
+        for row in range(self.rows):
+            dx = centres_x[:, None] - line.points[:, 0]
+            dy = (row + 0.5) * cell - line.points[:, 1]
+            self.grid[row] = arc[np.argmin(dx * dx + dy * dy, axis=1)]
+        self.rows_list = self.grid.tolist()
+
+    def progress(self, x, y):
+        """Distance along the line at (x, y), from 0 up to the line length"""
+        column = min(max(int(x) // self.cell, 0), self.columns - 1)
+        row = min(max(int(y) // self.cell, 0), self.rows - 1)
+        return self.rows_list[row][column]
+
+
+class RaceProgress:
+    """Laps, total distance and running order for a field of cars.
+
+    A car counts a lap when its progress wraps from the end of the line back
+    to the start, and loses it again if it reverses over the line. Call
+    update with every car's progress (from the field) once per simulation
+    step. State is kept in plain lists: for a race's worth of cars that is
+    several times cheaper per step than small NumPy arrays.
+    """
+
+    def __init__(self, field, count):
+        self.field = field
+        self.half_lap = field.line.length / 2
+        self.progress = [0.0] * count
+        self.laps = [0] * count
+        self.started = False
+
+    def reset(self):
+        self.progress = [0.0] * len(self.progress)
+        self.laps = [0] * len(self.laps)
+        self.started = False
+
+    def update(self, progress):
+        if self.started:
+            # A jump of more than half a lap can only be a wrap across the start
+            for i, (old, new) in enumerate(zip(self.progress, progress)):
+                if new - old < -self.half_lap:
+                    self.laps[i] += 1
+                elif new - old > self.half_lap:
+                    self.laps[i] -= 1
+        self.progress = list(progress)
+        self.started = True
+
+    def distance(self):
+        """Total distance covered by each car"""
+        length = self.field.line.length
+        return [laps * length + progress for laps, progress in zip(self.laps, self.progress)]
+
+    def order(self):
+        """Car indices from first to last place"""
+        distance = self.distance()
+        return sorted(range(len(distance)), key=distance.__getitem__, reverse=True)
+
+    def positions(self):
+        """Race position of each car, 1 for the leader"""
+        positions = [0] * len(self.laps)
+        for place, car in enumerate(self.order(), 1):
+            positions[car] = place
+        return positions
+
+
+def _distance_to(blocked, limit):
+    """Exact Euclidean distance from each pixel centre to the nearest blocked
+    pixel centre, up to limit. blocked is indexed [x, y].
+
+    Runs as two separable passes: distances along each column first, then
+    the nearest of those within limit pixels along each row.
+    """
+    column = np.where(blocked, 0, limit).astype(np.float32)
+    for _ in range(int(limit)):
+        np.minimum(column[:, 1:], column[:, :-1] + 1, out=column[:, 1:])
+        np.minimum(column[:, :-1], column[:, 1:] + 1, out=column[:, :-1])
+
+    column_squared = column * column
+    squared = column_squared.copy()
+    for dx in range(1, int(limit) + 1):
+        np.minimum(squared[dx:], column_squared[:-dx] + dx * dx, out=squared[dx:])
+        np.minimum(squared[:-dx], column_squared[dx:] + dx * dx, out=squared[:-dx])
+    return np.minimum(np.sqrt(squared), limit)
+
+
+class DistanceField:
+    """Signed distance to the edge of a mask's set pixels, in pixels.
+
+    Positive in free space, negative inside the mask, and clamped to
+    +-max_distance, which bounds how far a single lookup can vouch for.
+    The field is indexed [x, y] like pygame.surfarray.
+    """
+
+    def __init__(self, mask, max_distance=32):
+        blocked = pygame.surfarray.array3d(mask.to_surface())[:, :, 0] != 0
+        # Pixel centres sit half a pixel from the edge between free and blocked pixels
+        outside = _distance_to(blocked, max_distance + 1) - 0.5
+        inside = _distance_to(~blocked, max_distance + 1) - 0.5
+        self.field = np.clip(np.where(blocked, -inside, outside), -max_distance, max_distance)
+        self.max_distance = max_distance
+        self.width, self.height = blocked.shape
+
+    def distance(self, x, y):
+        """Signed distance at (x, y). Anywhere off the field counts as free"""
+        x, y = int(x), int(y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.field.item(x, y)
+        return self.max_distance
+
+    def normal(self, x, y):
+        """Unit vector pointing away from the nearest edge, from the field's gradient"""
+        gx = self.distance(x + 1, y) - self.distance(x - 1, y)
+        gy = self.distance(x, y + 1) - self.distance(x, y - 1)
+        length = math.hypot(gx, gy)
+        if length == 0:
+            return 0.0, 0.0
+        return gx / length, gy / length
+
+    def sweep(self, x0, y0, x1, y1, radius, max_iterations=16):
+        """Move a circle from (x0, y0) to (x1, y1) and find where it first touches an edge.
+
+        Sphere tracing: each lookup gives a distance that is safe to advance
+        by, so clear moves cost one lookup. Returns the fraction of the move
+        (0..1) at contact, or None if the whole move is clear.
+        """
+        length = math.hypot(x1 - x0, y1 - y0)
+        t = 0.0
+        for _ in range(max_iterations):
+            clearance = self.distance(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t) - radius
+            if clearance <= 0:
+                return t
+            if length == 0 or t + clearance / length >= 1:
+                return None
+            t += clearance / length
+
+        # Out of iterations, as a move grazing an edge takes ever shorter
+        # steps: check the rest of it a pixel at a time
+        step = 1 / length
+        while t < 1:
+            t = min(t + step, 1.0)
+            if self.distance(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t) - radius <= 0:
+                return t
+        return None
+
+
+@lru_cache(maxsize=None)
+def _racing_line(path, step):
+    return RacingLine(path, step)
+
+
+def get_racing_line(path, step=2.0):
+    """Racing line through path, built once per track and step"""
+    return _racing_line(tuple(map(tuple, path)), step)
+
+
+@lru_cache(maxsize=None)
+def _progress_field(path, size, start, cell):
+    return ProgressField(get_racing_line(path), size, start, cell)
+
+
+def get_progress_field(path, size, start, cell=8):
+    """Progress field for a track, built once per track, size and start"""
+    return _progress_field(tuple(map(tuple, path)), tuple(size), tuple(start), cell)
+
+
+@lru_cache(maxsize=None)
+def get_distance_field(mask, max_distance=32):
+    """Distance field of a mask, built once per mask and max_distance"""
+    return DistanceField(mask, max_distance)
@@ -1,44 +1,163 @@
+import os
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
 import pygame
 
+# Rotated sprites are cached per image at this angular resolution (degrees)
+ANGLE_STEP = 1
+# Rotations (and rotated masks) kept at once, least recently used dropped
+# first: every angle of 16 sprites
+ROTATION_CACHE_SIZE = 360 // ANGLE_STEP * 16
+_ROTATION_CACHE = OrderedDict()
+_MASK_CACHE = OrderedDict()
+
+# Sprites made from the same base (see skins.py) share its masks and geometry,
+# for as long as the sprite lives
+_SHAPES = weakref.WeakKeyDictionary()
+
+# Rendered text is reused across frames; menus and the HUD repeat the same strings
+TEXT_CACHE_SIZE = 256
+
+# Gradients are requested every frame with a handful of different sizes
+GRADIENT_CACHE_SIZE = 64
+
 
 def scale_image(img, factor):
     size = round(img.get_width() * factor), round(img.get_height() * factor)
     return pygame.transform.scale(img, size)
 
+def to_display_format(img):
+    """Convert a surface to the display pixel format, keeping per-pixel alpha if it has any.
+    Needs an open display"""
+    if img.get_flags() & pygame.SRCALPHA:
+        return img.convert_alpha()
+    return img.convert()
+
+def bake_layers(size, layers):
+    """Flatten (surface, position) layers, bottom first, into one opaque display-format surface"""
+    surface = pygame.Surface(size).convert()
+    for img, pos in layers:
+        surface.blit(img, pos)
+    return surface
+
+def quantize_angle(angle):
+    """Snap an angle to the rotation cache resolution, in [0, 360)"""
+    return round(angle / ANGLE_STEP) * ANGLE_STEP % 360
+
+def get_rotated(image, angle):
+    """Return (rotated_image, offset) for image, where offset moves the unrotated
+    top-left corner to the top-left of the rotated sprite so both share a center"""
+    key = (image, quantize_angle(angle))
+    entry = _ROTATION_CACHE.get(key)
+    if entry is None:
+        rotated_image = pygame.transform.rotate(image, key[1])
+        new_rect = rotated_image.get_rect(center=image.get_rect().center)
+        entry = _remember(_ROTATION_CACHE, key, (rotated_image, new_rect.topleft))
+    else:
+        _ROTATION_CACHE.move_to_end(key)
+    return entry
+
+def _remember(cache, key, entry):
+    """Add entry to a bounded rotation cache, dropping the least recently used"""
+    cache[key] = entry
+    if len(cache) > ROTATION_CACHE_SIZE:
+        cache.popitem(last=False)
+    return entry
+
+def share_shape(image, base):
+    """Make image use base's masks and geometry. They must be the same size and outline"""
+    _SHAPES[image] = get_shape(base)
+
+def get_shape(image):
+    """The image whose masks and geometry stand in for image's"""
+    return _SHAPES.get(image, image)
+
+def get_rotated_mask(image, angle):
+    """Return (mask, offset) for image rotated by angle, matching get_rotated.
+    Images sharing a shape share their masks"""
+    image = get_shape(image)
+    key = (image, quantize_angle(angle))
+    entry = _MASK_CACHE.get(key)
+    if entry is None:
+        rotated_image, offset = get_rotated(image, angle)
+        entry = _remember(_MASK_CACHE, key, (pygame.mask.from_surface(rotated_image), offset))
+    else:
+        _MASK_CACHE.move_to_end(key)
+    return entry
+
+def get_half_extents(image):
+    """(half width, half length) of an image's opaque pixels, measured from
+    the image centre it rotates around"""
+    return _half_extents(get_shape(image))
+
+@lru_cache(maxsize=None)
+def _half_extents(image):
+    bounds = image.get_bounding_rect()
+    center_x, center_y = image.get_width() / 2, image.get_height() / 2
+    return (max(center_x - bounds.left, bounds.right - center_x),
+            max(center_y - bounds.top, bounds.bottom - center_y))
+
+def warm_rotation_cache(images):
+    """Pre-render every cached angle (sprite and mask) for each image"""
+    for image in images:
+        for step in range(360 // ANGLE_STEP):
+            get_rotated(image, step * ANGLE_STEP)
+            get_rotated_mask(image, step * ANGLE_STEP)
+
 def blit_rotate_center(win, image, top_left, angle):
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center=image.get_rect(topleft = top_left).center)
-    win.blit(rotated_image, new_rect.topleft)
+    rotated_image, (dx, dy) = get_rotated(image, angle)
+    return win.blit(rotated_image, (top_left[0] + dx, top_left[1] + dy))
+
+@lru_cache(maxsize=None)
+def get_font(name, size, bold=False, italic=False):
+    """Resolve a system font once per (name, size, style)"""
+    return pygame.font.SysFont(name, size, bold=bold, italic=italic)
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font, text, color, antialias=True):
+    """Render text once per (font, text, color, antialias). The surface is shared,
+    so copy it before modifying it"""
+    return font.render(text, antialias, color)
 
 def blit_text_center(win, font, text, color=(255, 255, 255), shadow=True):
     if shadow:
         # Render shadow
-        shadow_render = font.render(text, 1, (0, 0, 0))
+        shadow_render = render_text(font, text, (0, 0, 0))
         shadow_x = win.get_width()/2 - shadow_render.get_width()/2 + 2
         shadow_y = win.get_height()/2 - shadow_render.get_height()/2 + 2
         win.blit(shadow_render, (shadow_x, shadow_y))
 
     # Render main text
-    render = font.render(text, 1, color)
+    render = render_text(font, text, tuple(color))
     win.blit(render, (win.get_width()/2 - render.get_width()/2, win.get_height()/2 - render.get_height()/2))
 
 def create_gradient_surface(width, height, color1, color2, vertical=True):
-    """Create a gradient surface from color1 to color2"""
-    surface = pygame.Surface((width, height))
-
-    if vertical:
-        for y in range(height):
-            ratio = y / height
-            r = int(color1[0] * (1 - ratio) + color2[0] * ratio)
-            g = int(color1[1] * (1 - ratio) + color2[1] * ratio)
-            b = int(color1[2] * (1 - ratio) + color2[2] * ratio)
-            pygame.draw.line(surface, (r, g, b), (0, y), (width, y))
-    else:
-        for x in range(width):
-            ratio = x / width
-            r = int(color1[0] * (1 - ratio) + color2[0] * ratio)
-            g = int(color1[1] * (1 - ratio) + color2[1] * ratio)
-            b = int(color1[2] * (1 - ratio) + color2[2] * ratio)
-            pygame.draw.line(surface, (r, g, b), (x, 0), (x, height))
-
-    return surface
\ No newline at end of file
+    """Create a gradient surface from color1 to color2.
+
+    Results are memoized and shared between callers, so copy the surface
+    before modifying it.
+    """
+    return _gradient_surface(width, height, tuple(color1), tuple(color2), vertical)
+
+@lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def _gradient_surface(width, height, color1, color2, vertical):
+    if width <= 0 or height <= 0:
+        return pygame.Surface((max(width, 0), max(height, 0)))
+
+    # Build a one pixel wide strip with array math, then stretch it across
+    length = height if vertical else width
+    ratio = np.arange(length) / length
+    strip = (np.outer(1 - ratio, color1) + np.outer(ratio, color2)).astype(np.uint8)
+    strip = strip[None, :, :] if vertical else strip[:, None, :]
+    return pygame.transform.scale(pygame.surfarray.make_surface(strip), (width, height))
+
+def prune_files(directory, suffix, keep):
+    """Delete all but the newest keep files ending in suffix from directory"""
+    if not os.path.isdir(directory):
+        return
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(suffix)]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:max(len(paths) - keep, 0)]:
+        os.remove(path)